@@ -2,6 +2,7 @@
 # # SPDX-License-Identifier: MIT
 # -*- coding: utf-8 -*-
 
+import hashlib
 import os
 from pathlib import Path
 
@@ -11,12 +12,12 @@ import pandas as pd
 
 from pypsa.descriptors import get_switchable_as_dense as get_as_dense
 from pypsa.descriptors import get_activity_mask, get_active_assets
-from pypsa.io import import_components_from_dataframe
 
 """
 List of general helper functions
 - configure_logging ->
 - normed ->
+- calc_line_limits -> build_topology.py
 """
 def configure_logging(snakemake, skip_handlers=False):
     """
@@ -79,7 +80,15 @@ def add_missing_carriers(n):
 """
 List of IO functions
     - load_network ->
+    - export_network ->
+    - write_network_dataset ->
+    - export_period_networks -> add_electricity.py
+    - open_network_dataset ->
+    - load_network_lazy ->
     - sets_path_to_root -> 
+    - get_workbook_hash ->
+    - write_cache_file ->
+    - read_excel_cached ->
     - read_and_filter_generators -> add_electricity.py
     - read_csv_nafix -> 
     - to_csv_nafix -> 
@@ -121,9 +130,90 @@ def sets_path_to_root(root_directory_name):
             upper_path = os.path.dirname(os.path.abspath("."))  # name of upper folder
             os.chdir(upper_path)
 
+WORKBOOK_CACHE_DIR = Path(__file__).parent.parent.joinpath("resources", "workbook_cache")
+_workbook_hashes = {}
+_workbook_frames = {}
+
+def get_workbook_hash(file):
+    # rehash only if the file on disk has been touched since the last call
+    stat = os.stat(file)
+    key = (os.path.abspath(file), stat.st_mtime_ns, stat.st_size)
+    if key not in _workbook_hashes:
+        with open(file, "rb") as f:
+            _workbook_hashes[key] = hashlib.sha256(f.read()).hexdigest()
+    return _workbook_hashes[key]
+
+def write_cache_file(path, write):
+    """
+    Write a file under resources that other rules may read concurrently. write(tmp_file) is
+    called on a temporary file in the same directory, which is then moved into place, so
+    readers never see a partially written file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_suffix(f".{os.getpid()}.tmp")
+    write(tmp_file)
+    os.replace(tmp_file, path)
+
+def read_excel_cached(file, sheet_name=0, **kwargs):
+    """
+    Drop-in replacement for ``pd.read_excel`` for the scenario workbooks.
+
+    Each sheet is parsed with openpyxl only once and stored as a pickled DataFrame
+    under ``resources/workbook_cache``. The cache key is the SHA-256 of the workbook
+    contents together with the sheet name and read arguments, so editing the xlsx
+    invalidates the cached frames automatically. Frames are also kept in memory so
+    repeated reads within a rule do not touch the disk.
+
+    Parameters
+    ----------
+    file : str
+        Path to the xlsx workbook.
+    sheet_name : str or int
+        As in ``pd.read_excel``; only a single sheet is supported.
+    **kwargs
+        Passed to ``pd.read_excel`` (e.g. ``index_col``, ``header``, ``na_values``).
+
+    Returns
+    -------
+    pd.DataFrame
+        A copy of the cached frame that callers are free to modify.
+    """
+    content_hash = get_workbook_hash(file)
+    # the pandas version is part of the key as pickles are not guaranteed to load across versions
+    read_args = hashlib.sha256(repr((sheet_name, sorted(kwargs.items()), pd.__version__)).encode()).hexdigest()
+    key = (content_hash, read_args)
+
+    if key not in _workbook_frames:
+        # the workbook path is part of the name so that workbooks with the same file name in
+        # different scenario folders do not share (and clean up) each other's cache files
+        stem = Path(file).stem
+        path_hash = hashlib.sha256(os.path.abspath(file).encode()).hexdigest()[:8]
+        cache_file = WORKBOOK_CACHE_DIR.joinpath(f"{stem}.{path_hash}.{content_hash[:16]}.{read_args[:16]}.pkl")
+        try:
+            df = pd.read_pickle(cache_file)
+        except FileNotFoundError:
+            # also covers a cache file removed by a parallel rule after a workbook edit
+            df = None
+        except Exception as e:
+            # a truncated or otherwise unreadable cache file is rebuilt from the workbook
+            import logging
+            logging.warning(f"Ignoring unreadable workbook cache {cache_file}: {e}")
+            df = None
+        if df is None:
+            df = pd.read_excel(file, sheet_name=sheet_name, **kwargs)
+            # remove frames cached from earlier versions of the same workbook
+            for stale in WORKBOOK_CACHE_DIR.glob(f"{stem}.{path_hash}.*.pkl"):
+                if stale.name.split(".")[-3] != content_hash[:16]:
+                    stale.unlink(missing_ok=True)
+            write_cache_file(cache_file, df.to_pickle)
+        _workbook_frames[key] = df
+
+    return _workbook_frames[key].copy()
+
 def read_and_filter_generators(file, sheet, index, filter_carriers):
-    df = pd.read_excel(
-        file, 
+    df = read_excel_cached(
+        file,
         sheet_name=sheet,
         na_values=["-"],
         index_col=[0,1]
@@ -208,6 +298,138 @@ def load_network(import_name=None, custom_components=None):
         override_component_attrs=override_component_attrs,
     )
 
+def export_network(n, path, config, precision=None):
+    """
+    Export the network to NetCDF with the settings under netcdf_export in config.yaml. Numeric
+    variables are compressed with zlib or zstd and time-varying tables are chunked along
+    snapshots, so lazy readers (open_network_dataset) only decompress the snapshots they use.
+    Float time-varying tables wider than precision (e.g. float64 after solving with
+    precision: float32) are down-cast in the file.
+
+    Parameters
+    ----------
+    n : pypsa.Network
+    path : str
+        Output NetCDF file.
+    config : dict
+        The netcdf_export section of the config.
+    precision : str or np.dtype, optional
+        The precision setting of the config, None keeps the dtypes of n.
+
+    Returns
+    -------
+    int
+        Bytes saved compared to the uncompressed, not down-cast dataset.
+    """
+    return write_network_dataset(n.export_to_netcdf(None), path, config, precision)
+
+def write_network_dataset(ds, path, config, precision=None):
+    """
+    Write a network dataset (n.export_to_netcdf(None)) to NetCDF with the netcdf_export
+    settings, see export_network.
+    """
+    import logging
+
+    uncompressed = ds.nbytes
+    if config["compression"] == "zlib":
+        compression = {"zlib": True, "complevel": config["complevel"]}
+    else:
+        compression = {"compression": config["compression"], "complevel": config["complevel"]}
+
+    encoding = {}
+    skipped = []
+    for name, var in ds.data_vars.items():
+        if "_t_" in name and var.dtype == object and var.size > 0:
+            # numeric time series that ended up as object dtype are written as float
+            try:
+                ds[name] = var = var.astype(float)
+            except (TypeError, ValueError):
+                skipped.append(name)
+        if not np.issubdtype(var.dtype, np.number) or var.size == 0:
+            continue
+        if (
+            precision is not None and "_t_" in name and np.issubdtype(var.dtype, np.floating)
+            and np.dtype(precision).itemsize < var.dtype.itemsize
+        ):
+            ds[name] = var = var.astype(precision)
+        encoding[name] = compression.copy()
+        if var.dims[0] == "snapshots":
+            encoding[name]["chunksizes"] = (min(config["chunk_snapshots"], var.shape[0]),) + var.shape[1:]
+
+    if skipped:
+        logging.warning(f"Non-numeric time series written without compression: {skipped}")
+    ds.to_netcdf(path, encoding=encoding)
+
+    saved = uncompressed - os.path.getsize(path)
+    logging.info(f"Exported network to {path}: {os.path.getsize(path)/1e6:.1f} MB, {saved/1e6:.1f} MB ({saved/uncompressed:.0%}) saved")
+    return saved
+
+def open_network_dataset(path, **kwargs):
+    """
+    Open a network exported with export_network lazily as a dask-backed xarray.Dataset. Data
+    is only read and decompressed, chunk by chunk, when it is accessed.
+    """
+    import xarray as xr
+
+    return xr.open_dataset(path, chunks={}, **kwargs)
+
+def load_network_lazy(path, components=None, periods=None, snapshots=None):
+    """
+    Load only part of an exported network. The file is opened lazily and only the selected
+    variables and snapshots are read from disk before the network is built.
+
+    Parameters
+    ----------
+    path : str
+        NetCDF file of the network.
+    components : dict, optional
+        Maps component names to the time-varying attributes to load, e.g.
+        ``{"Generator": ["p_max_pu", "p"], "Bus": []}``, or None for all of them. Static
+        attributes of listed components and of the buses are always loaded, other
+        components are skipped. Defaults to all components.
+    periods : list, optional
+        Investment periods to load. Defaults to all periods.
+    snapshots : slice or array, optional
+        Positions of the snapshots to load, applied after the selection of periods.
+
+    Returns
+    -------
+    pypsa.Network
+    """
+    import pypsa
+
+    ds = open_network_dataset(path)
+    list_names = pypsa.components.components.list_name
+
+    if components is not None:
+        keep = {list_names[c]: attrs for c, attrs in components.items()}
+        keep.setdefault("buses", []) # pypsa requires the buses to import any component
+        drop = []
+        for name in ds.variables:
+            list_name = max((l for l in list_names if name.startswith(l + "_")), key=len, default=None)
+            if list_name is None:
+                continue # network level variables, e.g. snapshots and investment periods
+            if list_name not in keep:
+                drop.append(name)
+            elif name.startswith(list_name + "_t_"):
+                attr = name[len(list_name) + 3:]
+                attr = attr[:-2] if name in ds.coords else attr # index of the time series, e.g. generators_t_p_max_pu_i
+                if keep[list_name] is not None and attr not in keep[list_name]:
+                    drop.append(name)
+        ds = ds.drop_vars(drop)
+
+    if periods is not None:
+        ds = ds.isel(snapshots=ds["snapshots_period"].isin(periods).values)
+        if "investment_periods" in ds.dims:
+            ds = ds.sel(investment_periods=periods)
+    if snapshots is not None:
+        ds = ds.isel(snapshots=snapshots)
+
+    n = pypsa.Network()
+    n.import_from_netcdf(ds.load())
+    ds.close()
+    return n
+
 def load_disaggregate(v, h):
     return pd.DataFrame(
         v.values.reshape((-1, 1)) * h.values, index=v.index, columns=h.index
@@ -233,11 +455,10 @@ def load_scenario_definition(snakemake):
 
     return scenario_setup
 
-def load_network_for_plots(fn, model_file, config, model_setup_costs, combine_hydro_ps=True, ):
-    import pypsa
+def load_network_for_plots(fn, model_file, config, model_setup_costs, combine_hydro_ps=True, components=None, periods=None):
     from add_electricity import load_costs, update_transmission_costs
 
-    n = pypsa.Network(fn)
+    n = load_network_lazy(fn, components=components, periods=periods)
 
     n.loads["carrier"] = n.loads.bus.map(n.buses.carrier) + " load"
     n.stores["carrier"] = n.stores.bus.map(n.buses.carrier)
@@ -708,6 +929,55 @@ def map_component_parameters(tech, first_year, tech_flag):
 
     return tech
 
+def set_per_period_table(n, key, table):
+    """
+    Stores a (periods x components) table in n.meta under key, to be expanded to the snapshots
+    only before solving (see pop_per_period_table and expand_per_period). Used for the
+    marginal_cost_per_period and lines derating_per_period options.
+    """
+    n.meta[key] = table.rename(index=str).to_dict()
+
+def pop_per_period_table(n, key):
+    """
+    Removes and returns the (periods x components) table stored with set_per_period_table.
+    Empty if it was not set.
+    """
+    table = pd.DataFrame(n.meta.pop(key, {}))
+    return table.set_axis(table.index.astype(int))
+
+def expand_per_period(n, component, attr, table):
+    if table.empty:
+        return
+    n.pnl(component)[attr][table.columns] = table.loc[n.snapshots.get_level_values(0)].values
+
+def calc_line_limits(length, voltage, line_config):
+    """
+    Thermal, SIL and St Clair limits (MW) of lines, vectorised over arrays of length (km) and
+    voltage (kV). Ratings per voltage class are taken from thermal and SIL under lines in the
+    config, lines of other voltages get NaN limits. The St Clair curve is digitised from
+    https://www.researchgate.net/figure/The-St-Clair-curve-as-based-on-the-results-of-14-retrieved-from-15-is-used-to_fig3_318692193
+
+    Returns a DataFrame with thermal_limit, SIL_limit and St_Clair_limit, indexed like length
+    if it is a Series.
+    """
+    index = length.index if isinstance(length, pd.Series) else None
+    length = np.asarray(pd.to_numeric(np.ravel(length), errors="coerce"), dtype=float)
+    voltage = np.asarray(pd.to_numeric(np.ravel(voltage), errors="coerce"), dtype=float)
+
+    classes = pd.Index(line_config["thermal"].keys()).intersection(pd.Index(line_config["SIL"].keys()))
+    thermal = np.append([line_config["thermal"][v] for v in classes], np.nan).astype(float)
+    SIL = np.append([line_config["SIL"][v] for v in classes], np.nan).astype(float)
+    pos = pd.Index(classes.astype(float)).get_indexer(voltage) # -1 picks the NaN appended above
+
+    thermal, SIL = thermal[pos], SIL[pos]
+    with np.errstate(divide="ignore"):
+        St_Clair = np.minimum(thermal, SIL * 53.736 * length ** -0.65)
+
+    return pd.DataFrame(
+        {"thermal_limit": thermal, "SIL_limit": SIL, "St_Clair_limit": St_Clair},
+        index=index,
+    )
+
 def remove_leap_day(df):
     return df[~((df.index.month == 2) & (df.index.day == 29))]
     
@@ -761,18 +1031,64 @@ def get_snapshots(sns, multi_invest):
 def get_investment_periods(sns, multi_invest):
     return sns.get_level_values(0).unique().to_list() if multi_invest else [sns[0].year]
 
+def set_time_series_precision(n, dtype):
+    """
+    Casts the floating point time-varying tables (n.<component>_t) of the network to dtype,
+    e.g. float32 to halve memory and NetCDF size, or float64 before solving.
+    """
+    for c in n.iterate_components():
+        for attr, df in c.pnl.items():
+            if not len(df.columns):
+                continue
+            if any(pd.api.types.is_object_dtype(t) for t in df.dtypes):
+                # numeric tables filled from object frames are converted, others are left as is
+                try:
+                    df = df.astype(float)
+                except (TypeError, ValueError):
+                    continue
+            if all(pd.api.types.is_float_dtype(t) for t in df.dtypes):
+                c.pnl[attr] = df.astype(dtype, copy=False)
+
+def get_dense_columns(n, component, attr, inds, snapshots=None):
+    """
+    Returns attr of the components inds as a (snapshots x inds) DataFrame, like
+    get_switchable_as_dense, but only the requested columns and snapshots are materialised
+    and the columns are in the order of inds.
+
+    Args:
+    - n: The network object.
+    - component: The component name, e.g. "Generator".
+    - attr: A switchable attribute, e.g. "p_max_pu".
+    - inds: The names of the components.
+    - snapshots: Subset of n.snapshots, defaults to all snapshots.
+    """
+    inds = pd.Index(inds)
+    pnl = n.pnl(component)[attr]
+    varying = inds.isin(pnl.columns)
+
+    values = np.empty((len(n.snapshots) if snapshots is None else len(snapshots), len(inds)))
+    values[:, ~varying] = n.df(component).loc[inds[~varying], attr].values
+    if varying.any():
+        varying_df = pnl[inds[varying]]
+        values[:, varying] = (varying_df if snapshots is None else varying_df.loc[snapshots]).values
+
+    return pd.DataFrame(values, index=n.snapshots if snapshots is None else snapshots, columns=inds)
+
 def adjust_by_p_max_pu(n, config):
     for carrier in config.keys():
         gen_list = n.generators[n.generators.carrier == carrier].index
+        p_max_pu = get_dense_columns(n, "Generator", "p_max_pu", gen_list)
         for p in config[carrier]:#["p_min_pu", "ramp_limit_up", "ramp_limit_down"]:
             n.generators_t[p][gen_list] = (
-                get_as_dense(n, "Generator", p)[gen_list] * get_as_dense(n, "Generator", "p_max_pu")[gen_list]
+                get_dense_columns(n, "Generator", p, gen_list) * p_max_pu
             )
 
 def initial_ramp_rate_fix(n):
-    ramp_up_dense = get_as_dense(n, "Generator", "ramp_limit_up")
-    ramp_down_dense = get_as_dense(n, "Generator", "ramp_limit_down")
-    p_min_pu_dense = get_as_dense(n, "Generator", "p_min_pu")
+    # only generators built after the first investment period are adjusted
+    gens = n.generators.query("build_year > @n.investment_periods[0] & build_year <= @n.investment_periods[-1]").index
+    ramp_up_dense = get_dense_columns(n, "Generator", "ramp_limit_up", gens)
+    ramp_down_dense = get_dense_columns(n, "Generator", "ramp_limit_down", gens)
+    p_min_pu_dense = get_dense_columns(n, "Generator", "p_min_pu", gens)
 
     limit_up = ~ramp_up_dense.isnull().all()
     limit_down = ~ramp_down_dense.isnull().all()
@@ -823,11 +1139,31 @@ def apply_default_attr(df, attrs):
     
     return df
 
-def add_noise(df, std_dev, steps):
-    noise = pd.Series(index=df.index, dtype=float)
-    idxs = noise.iloc[::steps].index
-    noise.loc[idxs] = df.loc[idxs] + np.random.normal(loc=0, scale=std_dev, size=len(idxs))
-    return noise.interpolate()
+def add_noise(df, std_dev, steps, rng=None):
+    """
+    Adds normally distributed noise to every steps-th row of df and linearly interpolates
+    the rows in between. All columns of a DataFrame are processed at once.
+
+    Args:
+    - df: A Series or DataFrame.
+    - std_dev: Standard deviation of the noise, a scalar or one value per column.
+    - steps: Number of rows between noise samples.
+    - rng: A numpy.random.Generator or seed, for reproducible noise.
+    """
+    rng = np.random.default_rng(rng)
+    values = df.to_numpy(dtype=float).reshape(len(df), -1)
+    idxs = np.arange(0, len(df), steps)
+    samples = values[idxs] + rng.normal(loc=0, scale=np.asarray(std_dev, dtype=float), size=(len(idxs), values.shape[1]))
+
+    # linear interpolation between samples, rows after the last sample keep its value
+    left = np.arange(len(df)) // steps
+    right = np.minimum(left + 1, len(idxs) - 1)
+    frac = np.where(left < right, (np.arange(len(df)) - idxs[left]) / steps, 0)[:, None]
+    noise = samples[left] * (1 - frac) + samples[right] * frac
+
+    if isinstance(df, pd.Series):
+        return pd.Series(noise[:, 0], index=df.index, name=df.name)
+    return pd.DataFrame(noise, index=df.index, columns=df.columns)
 
 def get_carriers_from_model_file(scenario_setup):
 
@@ -845,7 +1181,7 @@ def get_carriers_from_model_file(scenario_setup):
     }
     
     for tech in ["conventional", "renewables", "storage"]:
-        carriers["fixed"][tech] = list(pd.read_excel(
+        carriers["fixed"][tech] = list(read_excel_cached(
             os.path.join(scenario_setup["sub_path"],"fixed_technologies.xlsx"),
             sheet_name=f"{tech}",
             na_values=["-"],
@@ -853,7 +1189,7 @@ def get_carriers_from_model_file(scenario_setup):
         ).loc[scenario_setup[f"fixed_{tech}"]]["Carrier"].unique())
 
     ext_carriers = (
-        pd.read_excel(
+        read_excel_cached(
             os.path.join(scenario_setup["sub_path"],"extendable_technologies.xlsx"), 
             sheet_name='active',
             index_col=[0,1,2],
@@ -879,7 +1215,7 @@ def check_folder(path):
 
 def load_scenario_setup(scenarios_file, scenario):
     scenario_setup = (
-        pd.read_excel(
+        read_excel_cached(
             scenarios_file, 
             sheet_name="scenario_definition",
             index_col=[0])
@@ -888,168 +1224,79 @@ def load_scenario_setup(scenarios_file, scenario):
     return scenario_setup
 
 
-# Temp PyPSA fix ahead of master
-def single_year_network_copy(
-    n,
-    snapshots=None,
-    investment_periods=None,
-    ignore_standard_types=False,
-):
+def get_period_dataset(n, ds, period):
     """
-    Returns a deep copy of the Network object with all components and time-
-    dependent data.
-
-    Returns
-    --------
-    network : pypsa.Network
-
-    Parameters
-    ----------
-    with_time : boolean, default True
-        Copy snapshots and time-varying network.component_names_t data too.
-    snapshots : list or index slice
-        A list of snapshots to copy, must be a subset of
-        network.snapshots, defaults to network.snapshots
-    ignore_standard_types : boolean, default False
-        Ignore the PyPSA standard types.
-
-    Examples
-    --------
-    >>> network_copy = network.copy()
+    Slice the dataset of an exported network (n.export_to_netcdf(None)) to a single
+    investment period, keeping only the components active in that period. Slicing the
+    dataset avoids building a Network per period.
+
+    Args:
+    - n: pypsa.Network the dataset was exported from
+    - ds: xarray.Dataset of n
+    - period: investment period to keep
     """
-    (
-        override_components,
-        override_component_attrs,
-    ) = n._retrieve_overridden_components()
-
-    network = n.__class__(
-        ignore_standard_types=ignore_standard_types,
-        override_components=override_components,
-        override_component_attrs=override_component_attrs,
-    )
-
-    other_comps = sorted(n.all_components - {"Bus", "Carrier"})
-    for component in n.iterate_components(["Bus", "Carrier"] + other_comps):
-        df = component.df
-        # drop the standard types to avoid them being read in twice
-        if (
-            not ignore_standard_types
-            and component.name in n.standard_type_components
-        ):
-            df = component.df.drop(
-                network.components[component.name]["standard_types"].index
-            )
-        if investment_periods is not None:
-            df = df.loc[n.get_active_assets(component.name, investment_periods)]
-        import_components_from_dataframe(network, df, component.name)
-
-    if snapshots is None:
-        snapshots = n.snapshots
-    if investment_periods is None:
-        investment_periods = n.investment_period_weightings.index
-    network.set_snapshots(snapshots)
-    if not investment_periods.empty:
-        network.set_investment_periods(investment_periods)
-    for component in n.iterate_components():
-        pnl = getattr(network, component.list_name + "_t")
-        for k in component.pnl.keys():
-            if component.name in ["Generator", "Link", "StorageUnit", "Store"]:
-                active = n.df(component.name)[n.get_active_assets(component.name, investment_periods)].index
-                active = component.pnl[k].columns.intersection(active)
-                pnl[k] = component.pnl[k].loc[snapshots,active].copy()
-            else:
-                pnl[k] = component.pnl[k].loc[snapshots].copy()
-    network.snapshot_weightings = n.snapshot_weightings.loc[snapshots].copy()
-    network.investment_period_weightings = (
-        n.investment_period_weightings.loc[investment_periods].copy()
-    )
-
-    # catch all remaining attributes of network
-    for attr in ["name", "srid"]:
-        setattr(network, attr, getattr(n, attr))
-
-    return network
-
-
+    ds = ds.isel(snapshots=(ds["snapshots_period"].values == period))
+    ds = ds.sel(investment_periods=[period])
+    for c in n.iterate_components():
+        active = n.get_active_assets(c.name, period)
+        if active.all():
+            continue
+        active = c.df.index[active]
+        for dim in ds.dims:
+            if dim == c.list_name + "_i" or (dim.startswith(c.list_name + "_t_") and dim.endswith("_i")):
+                ds = ds.isel({dim: ds[dim].to_index().isin(active)})
+    return ds
 
-# Not needed once PyPSA main is updated
-def single_year_network_copy(
-    n,
-    snapshots=None,
-    investment_periods=None,
-    ignore_standard_types=False,
-):
+def _write_period_dataset(ds, path, config, precision):
     """
-    Returns a deep copy of the Network object with all components and time-
-    dependent data.
-
-    Returns
-    --------
-    network : pypsa.Network
-
-    Parameters
-    ----------
-    with_time : boolean, default True
-        Copy snapshots and time-varying network.component_names_t data too.
-    snapshots : list or index slice
-        A list of snapshots to copy, must be a subset of
-        network.snapshots, defaults to network.snapshots
-    ignore_standard_types : boolean, default False
-        Ignore the PyPSA standard types.
-
-    Examples
-    --------
-    >>> network_copy = network.copy()
+    Process pool worker of export_period_networks, returns the write time in seconds.
     """
-    (
-        override_components,
-        override_component_attrs,
-    ) = n._retrieve_overridden_components()
+    import time
 
-    network = n.__class__(
-        ignore_standard_types=ignore_standard_types,
-        override_components=override_components,
-        override_component_attrs=override_component_attrs,
-    )
+    start = time.perf_counter()
+    write_network_dataset(ds, path, config, precision)
+    return time.perf_counter() - start
 
-    other_comps = sorted(n.all_components - {"Bus", "Carrier"})
-    for component in n.iterate_components(["Bus", "Carrier"] + other_comps):
-        df = component.df
-        # drop the standard types to avoid them being read in twice
-        if (
-            not ignore_standard_types
-            and component.name in n.standard_type_components
-        ):
-            df = component.df.drop(
-                network.components[component.name]["standard_types"].index
+def export_period_networks(n, path, config, precision=None):
+    """
+    Export one network per investment period in a single pass: n is converted to a dataset
+    once and each period is written as a slice of it with export_network settings. With
+    nprocesses > 1 in config the slices are written in a process pool. A slice is only built
+    when a worker is free, so at most nprocesses slices are held in memory (and pickled) on
+    top of the full dataset, and workers never receive the whole network.
+
+    Args:
+    - n: pypsa.Network with multiple investment periods
+    - path: output file pattern containing {period}, e.g. "dispatch_{period}.nc"
+    - config: the netcdf_export section of the config
+    - precision: the precision setting of the config, see export_network
+    """
+    import logging
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    ds = n.export_to_netcdf(None)
+    periods = list(n.investment_periods)
+    nprocesses = min(len(periods), config.get("nprocesses", 1))
+
+    if nprocesses <= 1:
+        for i, period in enumerate(periods, 1):
+            elapsed = _write_period_dataset(get_period_dataset(n, ds, period), path.format(period=period), config, precision)
+            logging.info(f"Exported period {period} ({i}/{len(periods)}) in {elapsed:.1f}s")
+        return
+
+    logging.info(f"Exporting {len(periods)} periods with {nprocesses} processes.")
+    pending, done = {}, 0
+    with ProcessPoolExecutor(max_workers=nprocesses) as executor:
+        for period in periods:
+            if len(pending) == nprocesses:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done += 1
+                    logging.info(f"Exported period {pending.pop(future)} ({done}/{len(periods)}) in {future.result():.1f}s")
+            future = executor.submit(
+                _write_period_dataset, get_period_dataset(n, ds, period), path.format(period=period), config, precision
             )
-        if investment_periods is not None:
-            df = df.loc[n.get_active_assets(component.name, investment_periods)]
-        import_components_from_dataframe(network, df, component.name)
-
-    if snapshots is None:
-        snapshots = n.snapshots
-    if investment_periods is None:
-        investment_periods = n.investment_period_weightings.index
-    network.set_snapshots(snapshots)
-    if not investment_periods.empty:
-        network.set_investment_periods(investment_periods)
-    for component in n.iterate_components():
-        pnl = getattr(network, component.list_name + "_t")
-        for k in component.pnl.keys():
-            if component.name in ["Generator", "Link", "StorageUnit", "Store"]:
-                active = n.df(component.name)[n.get_active_assets(component.name, investment_periods)].index
-                active = component.pnl[k].columns.intersection(active)
-                pnl[k] = component.pnl[k].loc[snapshots,active].copy()
-            else:
-                pnl[k] = component.pnl[k].loc[snapshots].copy()
-    network.snapshot_weightings = n.snapshot_weightings.loc[snapshots].copy()
-    network.investment_period_weightings = (
-        n.investment_period_weightings.loc[investment_periods].copy()
-    )
-
-    # catch all remaining attributes of network
-    for attr in ["name", "srid"]:
-        setattr(network, attr, getattr(n, attr))
-
-    return network
\ No newline at end of file
+            pending[future] = period
+        for future in wait(pending).done:
+            done += 1
+            logging.info(f"Exported period {pending[future]} ({done}/{len(periods)}) in {future.result():.1f}s")
\ No newline at end of file
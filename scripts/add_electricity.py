@@ -97,10 +97,13 @@ logger = logging.getLogger(__name__)
 import numpy as np
 import pandas as pd
 import pypsa
+from scipy import sparse
 from pypsa.descriptors import get_switchable_as_dense as get_as_dense, get_activity_mask
 from pypsa.io import import_components_from_dataframe
 import os
-from shapely.geometry import Point
+import hashlib
+from pathlib import Path
+from functools import lru_cache
 import xarray as xr
 import warnings
 warnings.simplefilter(action="ignore") # Comment out for debugging and development
@@ -113,8 +116,12 @@ from _helpers import (
     apply_default_attr,
     convert_cost_units,
     drop_non_pypsa_attrs,
+    export_network,
+    export_period_networks,
     get_carriers_from_model_file,
+    get_dense_columns,
     get_investment_periods,
+    get_workbook_hash,
     get_snapshots,
     get_start_year,
     initial_ramp_rate_fix,
@@ -122,11 +129,16 @@ from _helpers import (
     map_component_parameters, 
     normed,
     read_and_filter_generators,
+    read_excel_cached,
     remove_leap_day,
-    single_year_network_copy,
+    set_per_period_table,
+    set_time_series_precision,
+    write_cache_file,
     load_scenario_definition
 )
 
+EAF_CACHE_DIR = Path(__file__).parent.parent.joinpath("resources", "eaf_profiles")
+
 """
 ********************************************************************************
     Cost related functions
@@ -149,33 +161,88 @@ def annualise_costs(investment, lifetime, discount_rate, FOM):
     CRF = discount_rate / (1 - 1 / (1 + discount_rate) ** lifetime)
     return (investment * CRF + FOM).fillna(0)
 
+class ExtendableParameterStore:
+    """
+    Memoises the extendable parameter matrix so that it is built only once per run.
+
+    Entries are keyed on the scenario workbook (path and content hash), the
+    extendable_parameters scenario, the investment periods and the currency and default
+    settings in the config. The store can be saved next to the elec network and loaded
+    by the solve rule, which then reuses the matrix instead of rebuilding it.
+    """
+    def __init__(self):
+        self.params = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, n, scenario_setup, snakemake):
+        workbook = os.path.join(scenario_setup["sub_path"], "extendable_technologies.xlsx")
+        costs = snakemake.config["costs"]
+        return (
+            os.path.abspath(workbook),
+            get_workbook_hash(workbook),
+            scenario_setup["extendable_parameters"],
+            tuple(get_investment_periods(n.snapshots, n.multi_invest)),
+            costs["USD_to_ZAR"],
+            costs["EUR_to_ZAR"],
+            repr(sorted(snakemake.config["electricity"]["extendable_parameters"]["defaults"].items())),
+        )
+
+    def get(self, n, scenario_setup, snakemake):
+        key = self.key(n, scenario_setup, snakemake)
+        if key in self.params:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.params[key] = build_extendable_parameters(n, scenario_setup, snakemake)
+        return self.params[key].copy()
+
+    def save(self, fn):
+        pd.to_pickle(self.params, fn)
+
+    def load(self, fn):
+        self.params.update(pd.read_pickle(fn))
+
+    def log_stats(self):
+        logger.info(f"Extendable parameter store: {self.hits} hits, {self.misses} misses")
+
+ext_param_store = ExtendableParameterStore()
+
 def load_extendable_parameters(n, scenario_setup, snakemake):
+    """
+    Returns the extendable parameter matrix from ext_param_store, building it on first use.
+    """
+    return ext_param_store.get(n, scenario_setup, snakemake)
+
+def build_extendable_parameters(n, scenario_setup, snakemake):
     """
     set all asset costs tab in the model file
     """
     defaults = snakemake.config["electricity"]["extendable_parameters"]["defaults"]
 
-    param_mapping = pd.read_excel(
+    param_mapping = read_excel_cached(
         os.path.join(scenario_setup["sub_path"],"extendable_technologies.xlsx"), 
         sheet_name = "parameter_mapping",
         index_col = [0,1],
     ).loc[scenario_setup["extendable_parameters"]]
 
-    param_matrix = pd.read_excel(
+    param_matrix = read_excel_cached(
         os.path.join(scenario_setup["sub_path"],"extendable_technologies.xlsx"), 
         sheet_name = "parameters",
         index_col = [0,2,1],
     ).sort_index()
+    param_matrix = param_matrix[~param_matrix.index.duplicated()]
 
-    param = pd.DataFrame(index = pd.MultiIndex.from_product([param_mapping.columns, param_mapping.index]), columns = param_matrix.columns)
-    
-    for idx in param.index:
-        mapping_ = param_mapping.loc[idx[1], idx[0]]
-        if pd.isna(mapping_):
-            # get default value from config file
-            param.loc[idx, :] = defaults[idx[0]]
-        else:
-            param.loc[idx, :] = param_matrix.loc[(mapping_, idx[0], idx[1]), :].values
+    # look up every (mapping, parameter, carrier) row in one reindex, rows without a mapping take the config default
+    param_idx = pd.MultiIndex.from_product([param_mapping.columns, param_mapping.index])
+    mapping = param_mapping.T.values.ravel()
+    param = param_matrix.reindex(
+        pd.MultiIndex.from_arrays([mapping, param_idx.get_level_values(0), param_idx.get_level_values(1)])
+    )
+    param.index = param_idx
+    no_mapping = np.broadcast_to(pd.isna(mapping)[:, None], param.shape)
+    param_defaults = np.broadcast_to(param_idx.get_level_values(0).map(defaults).values[:, None], param.shape)
+    param = param.astype(object).mask(no_mapping, param_defaults)
 
     param.drop("source", axis=1, inplace=True)
     
@@ -187,60 +254,41 @@ def load_extendable_parameters(n, scenario_setup, snakemake):
         for i in missing_year: 
             param.insert(0,i,np.nan) # add columns of missing year to dataframe
         param_tmp = param.drop("unit", axis=1).sort_index(axis=1)
-        param_tmp = param_tmp.interpolate(axis=1)
+        # interpolate numeric rows only, rows with text entries (e.g. build_phase_in) are kept as is
+        numeric = param_tmp.apply(pd.to_numeric, errors="coerce")
+        is_numeric = numeric.notnull().sum(axis=1) == param_tmp.notnull().sum(axis=1)
+        param_tmp = numeric.interpolate(axis=1).where(is_numeric, param_tmp, axis=0)
         param= pd.concat([param_tmp, param["unit"]], ignore_index=False, axis=1)
 
     # correct units to MW and ZAR
     param_yr = param.columns.drop("unit")
 
     param = convert_cost_units(param, snakemake.config["costs"]["USD_to_ZAR"], snakemake.config["costs"]["EUR_to_ZAR"])
-    
-    full_param = pd.DataFrame(
-        index = pd.MultiIndex.from_product(
-            [
-                param.index.get_level_values(0).unique(),
-                param.index.get_level_values(1).unique()]),
-        columns = param.columns
-    )
-    full_param.loc[param.index] = param.values
 
-    # full_costs adds default values when missing from costs table
-    config_defaults = snakemake.config["electricity"]["extendable_parameters"]["defaults"]
-    for default in param.index.get_level_values(0).intersection(config_defaults.keys()):
-        full_param.loc[param.loc[(default, slice(None)),:].index, :] = param.loc[(default, slice(None)),:]
-        full_param.loc[(default, slice(None)), param_yr] = full_param.loc[(default, slice(None)), param_yr].fillna(config_defaults[default])
-    #full_param = full_param.fillna("default")
-    param = full_param.copy()
+    # fill values missing from costs table with config defaults
+    config_defaults = np.broadcast_to(param.index.get_level_values(0).map(defaults).values[:, None], (len(param), len(param_yr)))
+    param[param_yr] = param[param_yr].where(param[param_yr].notnull(), config_defaults)
 
     # Get entries where FOM is specified as % of CAPEX
-    fom_perc_capex=param.loc[param.unit.str.contains("\%capex/year") == True, param_yr]
-    fom_perc_capex_idx=fom_perc_capex.index.get_level_values(1)
-
-    add_param = pd.DataFrame(
-        index = pd.MultiIndex.from_product([["capital_cost","marginal_cost"],param.loc["FOM"].index]),
-        columns = param.columns
-    )
-    
-    param = pd.concat([param, add_param],axis=0)
-    param.loc[("FOM",fom_perc_capex_idx), param_yr] *= (param.loc[("investment", fom_perc_capex_idx),param_yr]).values/100.0
-    param.loc[("FOM",fom_perc_capex_idx), "unit"] = param.loc[("investment", fom_perc_capex_idx),"unit"].values
+    fom = param.loc["FOM"]
+    fom_perc_capex = (fom.unit.str.contains("\%capex/year") == True).values
+    fom.loc[fom_perc_capex, param_yr] *= param.loc["investment", param_yr][fom_perc_capex] / 100.0
+    fom.loc[fom_perc_capex, "unit"] = param.loc["investment", "unit"][fom_perc_capex]
+    param.loc["FOM"] = fom.values
 
-    capital_costs = annualise_costs(
+    capital_cost = annualise_costs(
         param.loc["investment", param_yr],
         param.loc["lifetime", param_yr], 
         param.loc["discount_rate", param_yr],
         param.loc["FOM", param_yr],
-    )
-
-    param.loc["capital_cost", param_yr] = capital_costs.fillna(0).values
-    param.loc["capital_cost","unit"] = "R/MWe"
+    ).fillna(0).assign(unit="R/MWe")
 
-    vom = param.loc["VOM", param_yr].fillna(0)
-    fuel = (param.loc["fuel", param_yr] / param.loc["efficiency", param_yr]).fillna(0)
+    marginal_cost = (
+        param.loc["VOM", param_yr].fillna(0)
+        + (param.loc["fuel", param_yr] / param.loc["efficiency", param_yr]).fillna(0)
+    ).assign(unit="R/MWhe")
 
-    param.loc[("marginal_cost", vom.index), param_yr] = vom.values
-    param.loc[("marginal_cost", fuel.index), param_yr] += fuel.values
-    param.loc["marginal_cost","unit"] = "R/MWhe"
+    param = pd.concat([param, pd.concat({"capital_cost": capital_cost, "marginal_cost": marginal_cost})])
 
     #max_hours = snakemake.config["electricity"]["max_hours"]
     #param.loc[("capital_cost","battery"), :] = param.loc[("capital_cost","battery inverter"),:]
@@ -306,7 +354,7 @@ def attach_load(n, scenario_setup):
     load = pd.read_csv(snakemake.input.load,index_col=[0],parse_dates=True)
 
     annual_load = (
-        pd.read_excel(
+        read_excel_cached(
             os.path.join(
                 scenario_setup["sub_path"],
                 "annual_load.xlsx",
@@ -341,43 +389,101 @@ def attach_load(n, scenario_setup):
     Function to define p_max_pu and p_min_pu profiles 
 ********************************************************************************
 """
-def init_pu_profiles(gens, snapshots):
-    pu_profiles = pd.DataFrame(
-        index = pd.MultiIndex.from_product(
-            [["max", "min"], snapshots], 
-            names=["profile", "snapshots"]
-            ), 
-        columns = gens.index
-    )
-    pu_profiles.loc["max"] = 1 
-    pu_profiles.loc["min"] = 0
+class PuProfiles:
+    """
+    Array-backed container for the p_max_pu ("max") and p_min_pu ("min") profiles of generators.
 
-    return pu_profiles
+    Each profile is a (snapshots x generators) ndarray initialised to 1 (max) and 0 (min), with
+    a name -> column lookup so that blocks of generators can be assigned in one operation. The
+    profiles are only converted to DataFrames once, when they are attached to the network.
+
+    Args:
+    - gens: Names of the generators.
+    - snapshots: A DatetimeIndex of the snapshots.
+    - dtype: Floating point type of the profile arrays.
+    """
+    def __init__(self, gens, snapshots, dtype=np.float64):
+        self.snapshots = snapshots
+        self.columns = pd.Index(gens)
+        self.profiles = {
+            "max": np.ones((len(snapshots), len(gens)), dtype=dtype),
+            "min": np.zeros((len(snapshots), len(gens)), dtype=dtype),
+        }
+
+    def get(self, profile, gens):
+        return self.profiles[profile][:, self.columns.get_indexer(gens)]
+
+    def set(self, profile, gens, values, rows=None):
+        """
+        Assign values to the profile of gens, optionally only for the snapshots in the boolean
+        mask rows. values can be a scalar, a 1D array applied to all gens or a 2D array with one
+        column per generator, covering the selected snapshots. Generators not in the container
+        are ignored.
+        """
+        col_idx = self.columns.get_indexer(gens)
+        in_profiles = col_idx >= 0
+        values = np.asarray(values, dtype=self.profiles[profile].dtype)
+        if values.ndim == 1:
+            values = values[:, None]
+        elif values.ndim == 2:
+            values = values[:, in_profiles]
+        if rows is None:
+            self.profiles[profile][:, col_idx[in_profiles]] = values
+        else:
+            self.profiles[profile][np.ix_(np.flatnonzero(rows), col_idx[in_profiles])] = values
+
+    def add(self, gens, fill=np.nan):
+        gens = pd.Index(gens).difference(self.columns, sort=False)
+        for profile, values in self.profiles.items():
+            new_values = np.full((len(self.snapshots), len(gens)), fill, dtype=values.dtype)
+            self.profiles[profile] = np.hstack([values, new_values])
+        self.columns = self.columns.append(gens)
+
+    def drop(self, gens):
+        keep = ~self.columns.isin(gens)
+        for profile, values in self.profiles.items():
+            self.profiles[profile] = values[:, keep]
+        self.columns = self.columns[keep]
+
+    def fillna(self, value):
+        for values in self.profiles.values():
+            values[np.isnan(values)] = value
+
+    def to_frame(self, profile, index, gens=None):
+        gens = self.columns if gens is None else pd.Index(gens)
+        return pd.DataFrame(self.get(profile, gens), index=index, columns=gens)
+
+
+def get_reference_tiling(ref_years, ref_len, ext_years, n_snapshots):
+    """
+    Row positions into the reference data that cycle the reference weather years over the
+    snapshots.
+    """
+    if n_snapshots > ref_len * 2**(int(np.ceil(len(ext_years) / len(ref_years)))-1):
+        raise ValueError(f"Reference data for weather years {list(ref_years)} is too short to cover the snapshots.")
+    return np.arange(n_snapshots) % ref_len
 
 
 def extend_reference_data(n, ref_data, snapshots):
 
     # delete data from years if all zeros
-    ref_data = ref_data.groupby(pd.Grouper(freq='Y')).filter(lambda x: not (x==0).all().all())
+    non_zero = (ref_data != 0).values.reshape(len(ref_data), -1).any(axis=1)
+    ref_data = ref_data[pd.Series(non_zero).groupby(ref_data.index.year).transform("any").values]
 
     ext_years = snapshots.year.unique()
+    ref_years = ref_data.index.year.unique()
+    tiling = get_reference_tiling(ref_years, len(ref_data), ext_years, len(snapshots))
     if len(ref_data.shape) > 1:
-        extended_data = pd.DataFrame(0, index=snapshots, columns=ref_data.columns)
+        extended_data = pd.DataFrame(ref_data.values[tiling], index=snapshots, columns=ref_data.columns)
     else:
-        extended_data = pd.Series(0, index=snapshots)     
-    ref_years = ref_data.index.year.unique()
-
-    for _ in range(int(np.ceil(len(ext_years) / len(ref_years)))-1):
-        ref_data = pd.concat([ref_data, ref_data],axis=0)
-
-    extended_data.iloc[:] = ref_data.iloc[range(len(extended_data))].values
+        extended_data = pd.Series(ref_data.values[tiling], index=snapshots)
 
     return extended_data.clip(lower=0., upper=1.)
 
 
 def get_eaf_profiles(snapshots, type):
       
-    outages = pd.read_excel(
+    outages = read_excel_cached(
             os.path.join(scenario_setup["sub_path"], "plant_availability.xlsx"), 
             sheet_name='outage_profiles',
             index_col=[0,1,2],
@@ -385,6 +491,8 @@ def get_eaf_profiles(snapshots, type):
     ).loc[scenario_setup["outage_profiles"]]
     outages = outages[type+"_generators"]
 
+    rng = np.random.default_rng(snakemake.config["electricity"]["conventional_generators"]["noise_seed"])
+
     def proc_outage(outages, _type, snapshots):
         out_df = outages.loc[(_type, range(1,54)), :]
         out_df.index = range(1,54)
@@ -393,10 +501,7 @@ def get_eaf_profiles(snapshots, type):
         eaf_hrly = out_df.loc[snapshots.week]
         eaf_hrly.index = snapshots
 
-        for col in eaf_hrly.columns:
-            eaf_hrly[col] = add_noise(eaf_hrly[col], std_dev[col], 48)
-
-        return eaf_hrly
+        return add_noise(eaf_hrly, std_dev[eaf_hrly.columns].values, 48, rng)
 
     pclf = proc_outage(outages, "planned", snapshots)
     uoclf = proc_outage(outages, "unplanned", snapshots)
@@ -406,7 +511,7 @@ def get_eaf_profiles(snapshots, type):
 
 def clip_pu_profiles(n, pu, gen_list, lower=0, upper=1):
     n.generators_t[pu] = n.generators_t[pu].copy()
-    n.generators_t[pu].loc[:, gen_list] = get_as_dense(n, "Generator", pu)[gen_list].clip(lower=lower, upper=upper)
+    n.generators_t[pu][gen_list] = get_dense_columns(n, "Generator", pu, gen_list).clip(lower=lower, upper=upper)
 
 
 def proj_eaf_override(eaf_hrly, snapshots, include = "_EAF", exclude = "extendable"):
@@ -426,7 +531,7 @@ def proj_eaf_override(eaf_hrly, snapshots, include = "_EAF", exclude = "extendab
         project_parameters: parameters with _EAF or _extendable_EAF suffix  
     
     """
-    annual_avail = pd.read_excel(
+    annual_avail = read_excel_cached(
             os.path.join(scenario_setup["sub_path"], "plant_availability.xlsx"), 
             sheet_name='annual_availability',
             index_col=[0,1],
@@ -445,6 +550,66 @@ def proj_eaf_override(eaf_hrly, snapshots, include = "_EAF", exclude = "extendab
 
     return eaf_hrly
 
+def load_eaf_profiles(snapshots, type, include, exclude, add_stations=None):
+    """
+    Returns the hourly EAF profiles of get_eaf_profiles with proj_eaf_override applied. As the
+    noise is seeded, the profiles are stored as NetCDF under resources/eaf_profiles and reused
+    by later scenarios with the same plant_availability.xlsx contents, outage_profiles and
+    annual_availability keys, snapshot range and noise seed.
+
+    Args:
+    - snapshots: A Series containing the snapshots.
+    - type: "fixed" or "extendable" generators.
+    - include, exclude: Passed to proj_eaf_override.
+    - add_stations: Stations missing from the outage profiles that are set to 1 before the override.
+    """
+    seed = snakemake.config["electricity"]["conventional_generators"]["noise_seed"]
+    add_stations = [] if add_stations is None else add_stations
+
+    def build_eaf_profiles():
+        eaf_hrly = get_eaf_profiles(snapshots, type)
+        eaf_hrly[[s for s in add_stations if s not in eaf_hrly.columns]] = 1.
+        return proj_eaf_override(eaf_hrly, snapshots, include = include, exclude = exclude)
+
+    if seed is None:
+        return build_eaf_profiles()
+
+    workbook = os.path.join(scenario_setup["sub_path"], "plant_availability.xlsx")
+    workbook_hash = get_workbook_hash(workbook)
+    key = (
+        workbook_hash,
+        scenario_setup["outage_profiles"],
+        scenario_setup["annual_availability"],
+        type, include, exclude, sorted(add_stations),
+        str(snapshots[0]), str(snapshots[-1]), len(snapshots),
+        seed,
+    )
+    # named by workbook path and contents so that profiles of superseded workbook versions can be removed
+    path_hash = hashlib.sha256(os.path.abspath(workbook).encode()).hexdigest()[:8]
+    cache_file = EAF_CACHE_DIR.joinpath(
+        f"{type}.{path_hash}.{workbook_hash[:16]}.{hashlib.sha256(repr(key).encode()).hexdigest()[:16]}.nc"
+    )
+    try:
+        with xr.open_dataarray(cache_file) as eaf_hrly:
+            return pd.DataFrame(eaf_hrly.values, index=snapshots, columns=eaf_hrly.indexes["station"].rename(None))
+    except FileNotFoundError:
+        pass
+
+    eaf_hrly = build_eaf_profiles()
+    for stale in EAF_CACHE_DIR.glob(f"{type}.{path_hash}.*.nc"):
+        if stale.name.split(".")[-3] != workbook_hash[:16]:
+            stale.unlink(missing_ok=True)
+    write_cache_file(
+        cache_file,
+        xr.DataArray(
+            eaf_hrly.values, 
+            coords={"snapshot": snapshots, "station": eaf_hrly.columns.astype(str)}, 
+            dims=["snapshot", "station"],
+        ).to_netcdf,
+    )
+
+    return eaf_hrly
+
 def generate_eskom_re_profiles(n, carriers):
     """
     Generates Eskom renewable energy profiles for the network, based on the Eskom Data Portal information, found under
@@ -488,6 +653,31 @@ def generate_eskom_re_profiles(n, carriers):
             eskom_profiles.loc[y, carrier] = (eskom_data.loc[str(weather_years[cnt]), carrier]
                                             .clip(lower=0., upper=1.)).values
     return eskom_profiles
+class RenewableProfileStore:
+    """
+    Reader for the pre-calculated wind and solar PV profiles in renewable_profiles_updated.nc.
+
+    Each group of the NetCDF file is opened once, backed by dask so that only the buses and
+    regions selected for a carrier are read from disk, and kept for the remainder of the run.
+
+    Args:
+    - file: Path to the renewable profiles NetCDF file.
+    """
+    def __init__(self, file):
+        self.file = file
+        self.groups = {}
+
+    def get(self, group):
+        if group not in self.groups:
+            self.groups[group] = xr.open_dataarray(self.file, group=group, chunks={})
+        return self.groups[group]
+
+    def close(self):
+        for data in self.groups.values():
+            data.close()
+        self.groups = {}
+
+
 def generate_fixed_wind_solar_profiles(n, gens, snapshots, carriers, pu_profiles):
     """
     Generates fixed wind and solar PV profiles for the network based on timeseries data that is pre-calculated
@@ -498,7 +688,7 @@ def generate_fixed_wind_solar_profiles(n, gens, snapshots, carriers, pu_profiles
     - n: The network object.
     - gens: A DataFrame containing the generator information.
     - snapshots: A Series containing the snapshots.
-    - pu_profiles: The DataFrame to store the pu profiles.
+    - pu_profiles: The PuProfiles container to store the pu profiles.
 
     """
 
@@ -513,7 +703,7 @@ def generate_fixed_wind_solar_profiles(n, gens, snapshots, carriers, pu_profiles
             base_carrier = carrier
             
         data = f"{carrier}_fixed_{config['resource_profiles']['datasets'][carrier]}"
-        pu= xr.open_dataarray(snakemake.input.renewable_profiles, group=data).sel(param="pu").to_pandas()
+        pu = re_profiles.get(data).sel(param="pu").to_pandas()
         pu = remove_leap_day(pu)
         pu = pu[pu.index.year.isin(ref_years[base_carrier])]
         mapping = gens.loc[(gens["Model Key"] != np.nan) & (gens["carrier"] == carrier),"Model Key"]
@@ -521,8 +711,8 @@ def generate_fixed_wind_solar_profiles(n, gens, snapshots, carriers, pu_profiles
         pu = pu[mapping.index]
         pu.columns = mapping[pu.columns].values
         pu = extend_reference_data(n, pu, snapshots) * (1-config["degradation_adj_capacity_factor"][carrier])
-        pu_profiles.loc["max", pu.columns] = pu.values
-        pu_profiles.loc["min", pu.columns] = 0.98*pu.values # Existing REIPPP take or pay constraint (100% can cause instabilitites)
+        pu_profiles.set("max", pu.columns, pu.values)
+        pu_profiles.set("min", pu.columns, 0.98*pu.values) # Existing REIPPP take or pay constraint (100% can cause instabilitites)
 
     return pu_profiles
 
@@ -546,54 +736,100 @@ def generate_extendable_wind_solar_profiles(n, gens, snapshots, carriers, pu_pro
             bus_ref = config_profiles[carrier][1]
             weights = config_profiles[carrier][2]/np.array(config_profiles[carrier][2]).sum()
             if carrier == "wind_offshore":
-                data = xr.open_dataarray(snakemake.input.renewable_profiles, group=dataset).sel(bus=bus_ref, _type="floating", quantile=0.9).to_pandas()
+                data = re_profiles.get(dataset).sel(bus=bus_ref, _type="floating", quantile=0.9).to_pandas()
             else:
-                data = xr.open_dataarray(snakemake.input.renewable_profiles, group=dataset).sel(bus=bus_ref, intra_region=scenario_setup["resource_area"]).to_pandas()
+                data = re_profiles.get(dataset).sel(bus=bus_ref, intra_region=scenario_setup["resource_area"]).to_pandas()
+            data = data.dot(weights).to_frame(n.buses.index[0])
         else:
             dataset = f"{base_carrier}_{len(n.buses)}_{config_datasets[base_carrier]}"
-            data = xr.open_dataarray(snakemake.input.renewable_profiles, group=dataset)
+            data = re_profiles.get(dataset).sel(bus=n.buses.index, intra_region=scenario_setup["resource_area"]).transpose(..., "bus").to_pandas()
 
+        data = data[data.index.year.isin(snakemake.config["years"]["reference_weather_years"][base_carrier])]
+        data = remove_leap_day(data)
         for bus in n.buses.index:
-            pu_ref = data.sel(bus=bus, intra_region=scenario_setup["resource_area"]).to_pandas() if len(n.buses)!=1 else data.dot(weights)                
-            pu_ref = pu_ref[pu_ref.index.year.isin(snakemake.config["years"]["reference_weather_years"][base_carrier])]
-            pu_ref = remove_leap_day(pu_ref)
-            pu = pu_ref.copy()
-            for y in years:
-                pu.name = f"{bus}-{carrier}-{y}"
-                pu_profiles.loc["max", pu.name] = extend_reference_data(n, pu, snapshots).values * (1 - config["degradation_adj_capacity_factor"][carrier])
+            # the extended profile is the same for all build years of the bus and carrier
+            pu = extend_reference_data(n, data[bus], snapshots).values * (1 - config["degradation_adj_capacity_factor"][carrier])
+            pu_profiles.set("max", [f"{bus}-{carrier}-{y}" for y in years], pu)
 
     return pu_profiles
 
 def generate_rmippp_profiles(gens, pu_profiles):
     gen_list = gens[gens.carrier=="rmippp"].index
-    pu_profiles.loc[("max", slice(None)), gen_list] = 1
-    pu_profiles.loc[("max", pu_profiles.index.get_level_values(1).hour<5), gen_list] = 0
-    pu_profiles.loc[("max", pu_profiles.index.get_level_values(1).hour>21), gen_list] = 0
+    hours = pu_profiles.snapshots.hour
+    pu_profiles.set("max", gen_list, 1)
+    pu_profiles.set("max", gen_list, 0, rows=(hours<5) | (hours>21))
     return pu_profiles
 
 def group_pu_profiles(pu_profiles, component_df):
-    years = pu_profiles.index.get_level_values(1).year.unique()
-    p_nom_pu = pd.DataFrame(1, index = pu_profiles.loc["max"].index, columns = [])
-    pu_mul_p_nom = pu_profiles * component_df["p_nom"]
+    """
+    Replace the pu profiles of generators with apply_grouping by p_nom weighted profiles per
+    (Grouping, carrier, bus). For each year only generators active in that year contribute, and
+    the profile is normalised by the p_nom of the whole group so that p_nom_pu scales the group
+    down as units retire. The weighting is done with one sparse (generators x groups) matrix
+    per year multiplied against the profile arrays.
+
+    Args:
+    - pu_profiles: The PuProfiles container of all generators.
+    - component_df: A DataFrame containing generator data.
+
+    Returns:
+    - pu_profiles with grouped generators replaced by their groups.
+    - p_nom_pu: A DataFrame of the active share of p_nom of each group per snapshot.
+    """
+    snapshots = pu_profiles.snapshots
+    years = snapshots.year.unique()
+    year_idx = years.get_indexer(snapshots.year)
 
     filtered_df = component_df[component_df["apply_grouping"]].copy().fillna(0)
+    group_names = filtered_df["bus"] + "-" + filtered_df["carrier"] + "_" + filtered_df["Grouping"].astype(str)
+    group_codes, group_names = pd.factorize(group_names)
+
+    build_year = component_df.loc[filtered_df.index, "build_year"].values
+    end_year = component_df.loc[filtered_df.index, ["build_year", "lifetime"]].sum(axis=1).values
+    active = (end_year[:, None] >= years.values) & (build_year[:, None] <= years.values) # generators x years
+    p_nom = component_df.loc[filtered_df.index, "p_nom"].fillna(0).values
+    total_p_nom = np.bincount(group_codes, weights=p_nom, minlength=len(group_names))
+
+    # order groups as they were created when looping over bus, carrier, year and Grouping
+    first_year = np.where(active.any(axis=1), active.argmax(axis=1), len(years))
+    group_order = (
+        pd.DataFrame({
+            "group": group_codes,
+            "bus": pd.factorize(filtered_df["bus"])[0],
+            "carrier": pd.factorize(filtered_df["carrier"])[0],
+            "first_year": first_year,
+            "position": np.arange(len(filtered_df)),
+        })
+        .sort_values(["first_year", "position"])
+        .drop_duplicates("group")
+        .loc[lambda df: df["first_year"] < len(years)]
+        .sort_values(["bus", "carrier", "first_year", "position"])["group"]
+        .values
+    )
 
-    for bus in filtered_df.bus.unique():
-        for carrier in filtered_df.carrier.unique():
-            carrier_list = filtered_df[(filtered_df["carrier"] == carrier) & (filtered_df["bus"] == bus)].index
+    grouped_pu = {profile: np.empty((len(snapshots), len(group_names))) for profile in pu_profiles.profiles}
+    grouped_p_nom = np.empty((len(years), len(group_names)))
+    for i in range(len(years)):
+        weights = sparse.csr_matrix(
+            (p_nom * active[:, i], (np.arange(len(filtered_df)), group_codes)),
+            shape=(len(filtered_df), len(group_names)),
+        )
+        year_sns = year_idx == i
+        grouped_p_nom[i] = weights.sum(axis=0).A1 / total_p_nom
+        for profile in grouped_pu:
+            values = np.nan_to_num(pu_profiles.get(profile, filtered_df.index)[year_sns])
+            grouped_pu[profile][year_sns] = (weights.T @ values.T).T / total_p_nom
+
+    group_names = group_names[group_order]
+    pu_profiles.drop(filtered_df.index)
+    pu_profiles.add(group_names)
+    for profile, values in grouped_pu.items():
+        pu_profiles.set(profile, group_names, values[:, group_order])
+    pu_profiles.fillna(0)
 
-            for y in years:
-                active = carrier_list[(component_df.loc[carrier_list, ["build_year", "lifetime"]].sum(axis=1) >= y) & (component_df.loc[carrier_list, "build_year"] <= y)]
-                if len(active)>0:
-                    key_list = filtered_df.loc[active, "Grouping"]
-                    for key in key_list.unique():
-                        active_key = active[filtered_df.loc[active, "Grouping"] == key]
-                        init_active_key = carrier_list[filtered_df.loc[carrier_list, "Grouping"] == key]
-                        pu_profiles.loc[(slice(None), str(y)), bus + "-" + carrier + "_" + key] = pu_mul_p_nom.loc[(slice(None), str(y)), active_key].sum(axis=1) / component_df.loc[init_active_key, "p_nom"].sum()
-                        p_nom_pu.loc[str(y), bus + "-" + carrier + "_" + key] = component_df.loc[active_key, "p_nom"].sum() / component_df.loc[init_active_key, "p_nom"].sum()
-            pu_profiles.drop(columns = carrier_list, inplace=True)
+    p_nom_pu = pd.DataFrame(grouped_p_nom[np.ix_(year_idx, group_order)], index=snapshots, columns=group_names)
 
-    return pu_profiles.fillna(0), p_nom_pu.fillna(0) # TODO check .fillna(0) doesn't make ramp_rate infeasible on p_max_pu
+    return pu_profiles, p_nom_pu.fillna(0) # TODO check .fillna(0) doesn't make ramp_rate infeasible on p_max_pu
 
 """
 ********************************************************************************
@@ -639,6 +875,17 @@ def load_fixed_components(carriers, start_year, config, tech_flag):
     
     return tech
 
+@lru_cache(maxsize=None)
+def load_regions_index(regions, distance_crs):
+    """
+    Loads the supply regions reprojected to distance_crs once per run. The spatial index
+    (STRtree) of the returned GeoDataFrame is built on first use and cached with it.
+    """
+    regions_gdf = gpd.read_file(regions).to_crs(distance_crs).set_index("name")
+    regions_gdf.sindex
+    return regions_gdf
+
+
 def map_components_to_buses(component_df, regions, crs_config):
     """
     Associate every generator/storage_unit with the bus of the region based on GPS coords.
@@ -652,14 +899,15 @@ def map_components_to_buses(component_df, regions, crs_config):
         A DataFrame with the generators associated with their respective bus.
     """
 
-    regions_gdf = gpd.read_file(regions).to_crs(snakemake.config["gis"]["crs"]["distance_crs"]).set_index("name")
-    gps_gdf = gpd.GeoDataFrame(
-        geometry=gpd.GeoSeries([Point(o.x, o.y) for o in component_df[["x", "y"]].itertuples()],
-        index=component_df.index, 
+    regions_gdf = load_regions_index(regions, crs_config["distance_crs"])
+    points = gpd.GeoSeries(
+        gpd.points_from_xy(component_df["x"], component_df["y"]), 
         crs=crs_config["geo_crs"]
-    ).to_crs(crs_config["distance_crs"]))
-    joined = gpd.sjoin(gps_gdf, regions_gdf, how="left", op="within")
-    component_df["bus"] = joined["index_right"].copy()
+    ).to_crs(crs_config["distance_crs"])
+
+    point_i, region_i = regions_gdf.sindex.query(points.values, predicate="within")
+    bus = pd.Series(regions_gdf.index[region_i], index=point_i).groupby(level=0).first()
+    component_df["bus"] = pd.Series(bus.values, index=component_df.index[bus.index]).reindex(component_df.index)
 
     if empty_bus := list(component_df[~component_df["bus"].notnull()].index):
         logger.warning(f"Dropping generators/storage units with no bus assignment {empty_bus}")
@@ -687,18 +935,17 @@ def group_components(component_df, attrs):
     filtered_df = component_df.query("apply_grouping").copy().fillna(0)#[component_df["apply_grouping"]].copy().fillna(0)
 
     if len(filtered_df) > 0:
-        grouped_df = pd.DataFrame(index=filtered_df.groupby(["Grouping", "carrier", "bus"]).sum().index, columns = param_cols)
-        grouped_df["p_nom"] = filtered_df.groupby(["Grouping", "carrier", "bus"]).sum()["p_nom"]
-        grouped_df["build_year"] = filtered_df.groupby(["Grouping", "carrier", "bus"]).min()["build_year"]
-        grouped_df["lifetime"] = filtered_df.groupby(["Grouping", "carrier", "bus"]).max()["lifetime"]
-        
-        # calculate weighted average of remaining parameters in gens dataframe
-        for param in [p for p in params if p not in ["bus","carrier","p_nom", "lifetime", "build_year"]]:
-            weighted_sum = filtered_df.groupby(["Grouping", "carrier", "bus"]).apply(lambda x: (x[param] * x["p_nom"]).sum())
-            total_p_nom = filtered_df.groupby(["Grouping", "carrier", "bus"])["p_nom"].sum()
-            weighted_average = weighted_sum / total_p_nom 
-            grouped_df.loc[weighted_average.index, param] = weighted_average.values
-        
+        # p_nom weighted average of remaining parameters in a single groupby pass
+        weighted_params = [p for p in param_cols if p not in ["lifetime", "build_year"]]
+        grouped_df = (
+            filtered_df[weighted_params].mul(filtered_df["p_nom"], axis=0)
+            .assign(**filtered_df[["p_nom", "build_year", "lifetime"]])
+            .groupby([filtered_df["Grouping"], filtered_df["carrier"], filtered_df["bus"]])
+            .agg({**{p: "sum" for p in weighted_params}, "p_nom": "sum", "build_year": "min", "lifetime": "max"})
+        )
+        grouped_df[weighted_params] = grouped_df[weighted_params].div(grouped_df["p_nom"], axis=0)
+        grouped_df = grouped_df[param_cols + ["p_nom"]]
+
         rename_idx = grouped_df.index.get_level_values(2) +  "-" + grouped_df.index.get_level_values(1) +  "_" + grouped_df.index.get_level_values(0)
         grouped_df = grouped_df.reset_index(level=[1,2]).replace(0, np.nan).set_index(rename_idx) 
     else:
@@ -725,24 +972,18 @@ def attach_fixed_generators(n, carriers):
     # load generators from model file
     gens = load_fixed_components(carriers, start_year, snakemake.config["electricity"], "Generator")
     gens = map_components_to_buses(gens, snakemake.input.supply_regions, snakemake.config["gis"]["crs"])
-    pu_profiles = init_pu_profiles(gens, snapshots)
+    pu_profiles = PuProfiles(gens.index, snapshots, snakemake.config["precision"])
 
     unique_entries = set()
     coal_gens =  [unique_entries.add(g.split("*")[0]) or g.split("*")[0] for g in gens[gens.carrier == 'coal'].index if g.split("*")[0] not in unique_entries]
-    conv_pu = get_eaf_profiles(snapshots, "fixed")
-    
-    not_in_pu = [g for g in coal_gens if g not in conv_pu.columns]
-    conv_pu[not_in_pu] = 1    
-    conv_pu = proj_eaf_override(conv_pu, snapshots, include = "_EAF", exclude = "extendable")
+    conv_pu = load_eaf_profiles(snapshots, "fixed", include = "_EAF", exclude = "extendable", add_stations = coal_gens)
     
     # Copy pu_profiles max to conv_pu
-    common_gens = [g for g in conv_pu.columns if g in pu_profiles.loc["max"].columns]
-    pu_profiles.loc["max", common_gens] = conv_pu[common_gens].values
+    common_gens = [g for g in conv_pu.columns if g in pu_profiles.columns]
+    pu_profiles.set("max", common_gens, conv_pu[common_gens].values)
 
     split_gens = [g for g in gens.index if "*" in g]
-    for gen in split_gens:
-        station = gen.split("*")[0]
-        pu_profiles.loc["max", gen] = conv_pu[station].values
+    pu_profiles.set("max", split_gens, conv_pu[[gen.split("*")[0] for gen in split_gens]].values)
 
     # eskom_carriers = [carrier for carrier in conv_carriers if carrier not in ["nuclear", "hydro", "hydro_import"]]
     # for col in gens.query("Grouping == 'eskom' & carrier in @eskom_carriers").index:
@@ -754,9 +995,9 @@ def attach_fixed_generators(n, carriers):
     # Hourly data from Eskom data portal
     eskom_re_pu = generate_eskom_re_profiles(n, re_carriers)
     eskom_re_carriers = eskom_re_pu.columns
-    for col in gens.query("carrier in @eskom_re_carriers").index:
-        pu_profiles.loc["max", col] = eskom_re_pu[gens.loc[col, "carrier"]].values
-        pu_profiles.loc["min", col] = eskom_re_pu[gens.loc[col, "carrier"]].values
+    eskom_re_gens = gens.query("carrier in @eskom_re_carriers")
+    pu_profiles.set("max", eskom_re_gens.index, eskom_re_pu[eskom_re_gens.carrier].values)
+    pu_profiles.set("min", eskom_re_gens.index, eskom_re_pu[eskom_re_gens.carrier].values)
 
     # Wind and solar profiles if not using Eskom data portal
     pu_profiles = generate_fixed_wind_solar_profiles(n, gens, snapshots, re_carriers, pu_profiles)
@@ -771,8 +1012,8 @@ def attach_fixed_generators(n, carriers):
     n.import_components_from_dataframe(drop_non_pypsa_attrs(n, "Generator", non_grouped_gens), "Generator")
     n.import_components_from_dataframe(drop_non_pypsa_attrs(n, "Generator", grouped_gens), "Generator")
 
-    pu_max, pu_min = pu_profiles.loc["max"], pu_profiles.loc["min"]
-    pu_max.index, pu_min.index, p_nom_pu.index = n.snapshots, n.snapshots, n.snapshots
+    pu_max, pu_min = pu_profiles.to_frame("max", n.snapshots), pu_profiles.to_frame("min", n.snapshots)
+    p_nom_pu.index = n.snapshots
 
     n.generators_t.p_nom_pu = p_nom_pu
     n.generators_t.p_max_pu = pu_max.clip(lower=0.0, upper=1.0)
@@ -795,7 +1036,7 @@ def attach_fixed_generators(n, carriers):
 
 def define_extendable_tech(carriers, years, type_, ext_param):
 
-    ext_max_build = pd.read_excel(
+    ext_max_build = read_excel_cached(
         os.path.join(scenario_setup["sub_path"],"extendable_technologies.xlsx"), 
         sheet_name='max_total_installed',
         index_col= [0,1,3,2,4],
@@ -844,21 +1085,20 @@ def attach_extendable_generators(n, carriers):
     gens = set_extendable_params("Generator", ext_gens_list, ext_param)
     gens = set_annual_build_limits(gens, ext_years, "Generator")
      
-    pu_profiles = init_pu_profiles(gens, snapshots)
+    pu_profiles = PuProfiles(gens.index, snapshots, snakemake.config["precision"])
     
     # Monthly average EAF for conventional plants from Eskom
-    conv_pu = get_eaf_profiles(snapshots, "extendable")
-    conv_pu = proj_eaf_override(conv_pu, snapshots, include = "_extendable_EAF", exclude = "NA")
+    conv_pu = load_eaf_profiles(snapshots, "extendable", include = "_extendable_EAF", exclude = "NA")
 
-    for col in gens.query("carrier in @conv_carriers & p_nom_extendable == True").index:
-        pu_profiles.loc["max", col] = conv_pu[col.split("-")[1]].values
+    conv_gens = gens.query("carrier in @conv_carriers & p_nom_extendable == True").index
+    pu_profiles.set("max", conv_gens, conv_pu[conv_gens.str.split("-").str[1]].values)
 
     # Hourly data from Eskom data portal
     eskom_ref_re_pu = generate_eskom_re_profiles(n, re_carriers)  
     eskom_ref_re_carriers = [carrier for carrier in eskom_ref_re_pu.columns if carrier in n.generators.carrier.unique()]# and carrier not in committable_carriers
 
-    for col in gens.query("carrier in @eskom_ref_re_carriers & p_nom_extendable == True").index:
-        pu_profiles.loc["max", col] = eskom_ref_re_pu[gens.loc[col, "carrier"]].values
+    eskom_ref_re_gens = gens.query("carrier in @eskom_ref_re_carriers & p_nom_extendable == True")
+    pu_profiles.set("max", eskom_ref_re_gens.index, eskom_ref_re_pu[eskom_ref_re_gens.carrier].values)
 
 
     pu_profiles = generate_extendable_wind_solar_profiles(n, gens, snapshots, re_carriers, pu_profiles)
@@ -869,10 +1109,9 @@ def attach_extendable_generators(n, carriers):
 
     in_network = [g for g in pu_profiles.columns if g in n.generators.index]
 
-    pu_max, pu_min = pu_profiles.loc["max", in_network], pu_profiles.loc["min", in_network]
-    pu_max.index, pu_min.index = n.snapshots, n.snapshots
-    n.generators_t.p_max_pu.loc[:, in_network] = pu_max.loc[:, in_network].clip(lower=0.0, upper=1.0)
-    n.generators_t.p_min_pu.loc[:, in_network] = pu_min.loc[:, in_network].clip(lower=0.0, upper=1.0)
+    pu_max, pu_min = pu_profiles.to_frame("max", n.snapshots, in_network), pu_profiles.to_frame("min", n.snapshots, in_network)
+    n.generators_t.p_max_pu.loc[:, in_network] = pu_max.clip(lower=0.0, upper=1.0)
+    n.generators_t.p_min_pu.loc[:, in_network] = pu_min.clip(lower=0.0, upper=1.0)
 
     #for carrier, value in snakemake.config["electricity"]["min_hourly_station_gen"]["fixed"].items():
     #    clip_pu_profiles(n, "p_min_pu", n.generators.query("carrier == @carrier & p_nom_extendable").index, lower=value, upper=1.0)
@@ -882,7 +1121,7 @@ def set_annual_build_limits(techs, ext_years, component):
     
     default_lim = {"max":np.inf,"min":0}
     for lim in ['max',"min"]:
-        annual_limit = pd.read_excel(
+        annual_limit = read_excel_cached(
             os.path.join(scenario_setup["sub_path"], "extendable_technologies.xlsx"), 
             sheet_name = f"{lim}_annual_installed",
             index_col = [0,1,2,3,4,5],
@@ -891,25 +1130,18 @@ def set_annual_build_limits(techs, ext_years, component):
             if lim =="max":
                 annual_limit.replace('unc', np.inf, inplace=True)
 
-            # get bus and carriers
-            bus_list = techs.bus.unique()
-            carrier_list = techs.carrier.unique()
-
-            bus_list = [bus for bus in techs.bus.unique() if bus in annual_limit.index.get_level_values(0)]
-            carrier_list = [carrier for carrier in techs.carrier.unique() if carrier in annual_limit.index.get_level_values(2)]
-
-            #check intersection between carrier_list and annual_limit_max.index.get_level
-            for bus in bus_list:
-                limit = annual_limit.loc[bus, component]
-                for carrier in carrier_list:
-                    for year in ext_years:
-                        if (f"{bus}-{carrier}-{year}" in techs.index) and (carrier in limit.index):
-                            if (lim=="max") & (limit.loc[carrier, year]==0):
-                                techs.drop(f"{bus}-{carrier}-{year}", inplace=True)
-                            else:
-                                techs.loc[f"{bus}-{carrier}-{year}", f"p_nom_{lim}"] = limit.loc[carrier, year]
-
-            techs[f"p_nom_{lim}"].fillna(default_lim[lim], inplace=True)
+            # join limits on (bus, carrier) rows and build_year columns of the techs
+            limit = annual_limit.xs(component, level=1)
+            rows = limit.index.get_indexer(pd.MultiIndex.from_arrays([techs.bus, techs.carrier]))
+            cols = limit.columns.get_indexer(techs.build_year)
+            has_limit = (rows >= 0) & (cols >= 0) & techs.build_year.isin(ext_years).values
+            values = pd.Series(limit.values[rows[has_limit], cols[has_limit]], index=techs.index[has_limit])
+
+            techs.loc[values.index, f"p_nom_{lim}"] = values
+            if lim == "max":
+                techs = techs[~techs.index.isin(values.index[values == 0])]
+
+            techs[f"p_nom_{lim}"] = techs[f"p_nom_{lim}"].fillna(default_lim[lim])
     return techs 
 
 def set_extendable_params(c, bus_carrier_years, ext_param, **config):
@@ -951,15 +1183,21 @@ def set_extendable_params(c, bus_carrier_years, ext_param, **config):
     component_df["carrier"] = component_df.index.str.split("-").str[1]
     component_df["build_year"] = component_df.index.str.split("-").str[2].astype(int)
     
+    params = default_col + uc_param if c == "Generator" else default_col
+
+    # gather every (param, carrier, build_year) value in one indexed take on the stacked parameter table
+    stacked_param = ext_param.drop("unit", axis=1).stack()
+    lookup = pd.MultiIndex.from_arrays([
+        np.repeat(params, len(component_df)),
+        np.tile(component_df["carrier"].values, len(params)),
+        np.tile(component_df["build_year"].values, len(params)),
+    ])
+    values = stacked_param.reindex(lookup).values.reshape(len(params), len(component_df)).T
+    component_df[params] = pd.DataFrame(values, index = component_df.index, columns = params).infer_objects()
+
     if c == "Generator":
-        component_df = pd.concat([component_df, pd.DataFrame(index = bus_carrier_years, columns = uc_param)],axis=1)
-        for param in default_col + uc_param:
-            component_df[param] =  component_df.apply(lambda row: ext_param.loc[(param, row["carrier"]), row["build_year"]], axis=1)
-            component_df = apply_default_attr(component_df, n.component_attrs[c])
+        component_df = apply_default_attr(component_df, n.component_attrs[c])
     elif c == "StorageUnit":
-        for param in default_col:
-            component_df[param] =  component_df.apply(lambda row: ext_param.loc[(param, row["carrier"]), row["build_year"]], axis=1)
-        
         component_df["cyclic_state_of_charge"] = True
         component_df["cyclic_state_of_charge_per_period"] = True
         component_df["efficiency_store"] = component_df["efficiency"]**0.5
@@ -971,8 +1209,8 @@ def set_extendable_params(c, bus_carrier_years, ext_param, **config):
 
 def apply_extendable_phase_in(n):
     param = load_extendable_parameters(n, scenario_setup, snakemake).loc["build_phase_in"]
-    pu_max = get_as_dense(n, "Generator", "p_max_pu")
     ext_i = n.generators.query("p_nom_extendable").index
+    build_year = n.generators.loc[ext_i, "build_year"].values
     
     phase_in = pd.DataFrame(1, index =range(8760), columns = ["overnight", "linear", "quarterly"]) 
     phase_in.loc[:, "linear"] = np.round(np.arange(0, 1, 1/8760),3)
@@ -980,48 +1218,53 @@ def apply_extendable_phase_in(n):
     phase_in.loc[2190:4380, "quarterly"] = 0.5
     phase_in.loc[4380:6570, "quarterly"] = 0.75
 
-    for gen in ext_i:
-        build_year = n.generators.loc[gen, "build_year"]  
-        method = param.loc[gen.split('-')[1], build_year]
-        phasing = phase_in[method]
-        if method not in ["overnight", "linear", "quarterly"]:
-            raise ValueError(f"Invalid method for phase-in of extendable generators: {method}. Choose from 'overnight', 'linear' or 'quarterly'.")
+    method = param.stack().reindex(pd.MultiIndex.from_arrays([ext_i.str.split("-").str[1], build_year]))
+    invalid = ~method.isin(phase_in.columns)
+    if invalid.any():
+        raise ValueError(f"Invalid method for phase-in of extendable generators: {list(method[invalid].unique())}. Choose from 'overnight', 'linear' or 'quarterly'.")
 
-        if method != "overnight":
-            n.generators.loc[gen, "lifetime"] += 1
+    n.generators.loc[ext_i[(method != "overnight").values], "lifetime"] += 1
 
-        gen_pu_max = pu_max[gen]
-        build_year_level = [build_year] * len(gen_pu_max.loc[build_year].index)
-        phasing.index = pd.MultiIndex.from_arrays([build_year_level, gen_pu_max.loc[build_year].index])
-        
-        gen_pu_max.loc[pd.IndexSlice[gen_pu_max.index.get_level_values(0) < build_year]] = 0
-        gen_pu_max.loc[build_year] =  gen_pu_max.loc[build_year] * phasing
+    # phasing factor per snapshot and generator: 0 before the build year, phased in over the build year and 1 after
+    periods = n.snapshots.get_level_values(0).values[:, None]
+    hour_of_period = n.snapshots.to_frame().groupby(level=0).cumcount().values
+    phasing = phase_in.values[hour_of_period][:, phase_in.columns.get_indexer(method)]
+    phasing = np.where(periods < build_year, 0, np.where(periods == build_year, phasing, 1))
 
-        n.generators_t.p_max_pu.loc[:, gen] = gen_pu_max.values
+    pu_max = get_dense_columns(n, "Generator", "p_max_pu", ext_i)
+    n.generators_t.p_max_pu[ext_i] = pu_max.values * phasing
 
 
-def adjust_for_variable_fuel_costs(n):
+def adjust_for_variable_fuel_costs(n, per_period=False):
+    """
+    Sets the marginal cost of generators whose fuel cost varies across investment periods to
+    fuel/efficiency + VOM of each period. The cost is either broadcast over the snapshots into
+    n.generators_t.marginal_cost, or with per_period kept as a (periods x generators) table in
+    n.meta that is expanded to the snapshots just before solving, see set_per_period_table.
+    """
     param = load_extendable_parameters(n, scenario_setup, snakemake)
     # check if any variation in marginal cost across years
     variable_fuel_cost = param.loc["fuel", n.investment_periods]
     variable_fuel_cost = variable_fuel_cost[variable_fuel_cost.mean(axis=1) != variable_fuel_cost.iloc[:, 0]]
 
-    gen_list = n.generators.query("carrier in @variable_fuel_cost.index").index
-    marginal_cost = pd.DataFrame(index = n.snapshots, columns = gen_list)
-    for carrier in variable_fuel_cost.index:
-        for gen in n.generators.query("carrier == @carrier").index:
-            cost = variable_fuel_cost.loc[carrier] / n.generators.loc[gen, "efficiency"] + param.loc[("VOM", carrier), n.investment_periods]
-            for y in n.investment_periods:
-                marginal_cost.loc[y, gen_list] = cost.loc[y]
-            n.generators.marginal_cost[gen] = 0
-            n.generators_t.marginal_cost[gen] = marginal_cost[gen]
+    gens = n.generators.query("carrier in @variable_fuel_cost.index")
+    marginal_cost = (
+        variable_fuel_cost.loc[gens.carrier].div(gens["efficiency"].values, axis=0)
+        + param.loc["VOM"].loc[gens.carrier, n.investment_periods].values
+    ).set_axis(gens.index).T.astype(float) # the parameter matrix is object dtype
+
+    n.generators.loc[gens.index, "marginal_cost"] = 0
+    if per_period:
+        set_per_period_table(n, "marginal_cost_per_period", marginal_cost)
+    else:
+        n.generators_t.marginal_cost[gens.index] = marginal_cost.loc[n.snapshots.get_level_values(0)].values
 
 def set_hourly_coal_generation_threshold(n):
     if scenario_setup["min_station_hourly"] in ["NA", "None", "none"]:
         return
     
     min_pu_override = (
-        pd.read_excel(
+        read_excel_cached(
             os.path.join(scenario_setup["sub_path"],"plant_availability.xlsx"), 
             sheet_name="min_station_hrly_cap_fact",
             index_col=[0,1])
@@ -1032,8 +1275,8 @@ def set_hourly_coal_generation_threshold(n):
     n.generators_t.p_min_pu = n.generators_t.p_min_pu.copy()    
     for carrier in carrier_list:
         gen_list = n.generators.query("carrier == @carrier").index
-        for y in n.investment_periods:
-            n.generators_t.p_min_pu.loc[y, gen_list] = get_as_dense(n, "Generator", "p_min_pu")[gen_list].clip(lower=min_pu_override.loc[carrier, y])
+        min_pu = min_pu_override.loc[carrier, n.snapshots.get_level_values(0)].values
+        n.generators_t.p_min_pu[gen_list] = get_dense_columns(n, "Generator", "p_min_pu", gen_list).clip(lower=min_pu, axis=0)
 
 """
 ********************************************************************************
@@ -1121,24 +1364,31 @@ def attach_extendable_storage(n, carriers):
 
 
 def check_pu_profiles(clean_flag):
-    p_max_pu = get_as_dense(n, "Generator", "p_max_pu")
-    p_min_pu = get_as_dense(n, "Generator", "p_min_pu")
+    # only generators with a p_max_pu or p_min_pu time series need to be checked hourly
+    varying = n.generators_t.p_max_pu.columns.union(n.generators_t.p_min_pu.columns)
+    static = n.generators.index.difference(varying)
+    p_max_pu = get_dense_columns(n, "Generator", "p_max_pu", varying)
+    p_min_pu = get_dense_columns(n, "Generator", "p_min_pu", varying)
 
     errors = p_max_pu < p_min_pu
-    error_lst = errors.any()
-    if errors.any().any() and not clean_flag:
+    static_errors = n.generators.loc[static, "p_max_pu"] < n.generators.loc[static, "p_min_pu"]
+    error_lst = pd.concat([errors.any(), static_errors])
+    if error_lst.any() and not clean_flag:
         raise ValueError(
             f'Some generators have p_max_pu < p_min_pu in some hours. This will cause the problem to be infeasible.\nEither set clean_pu_profiles under config to True or correct input assumptions. Errors can be found in the follwing generators:\n{error_lst[error_lst].index}'
         )
-    elif errors.any().any() and clean_flag:
+    elif error_lst.any() and clean_flag:
         logging.info(f"Adjusting by p_max_pu for {error_lst[error_lst].index}")
-        n.generators_t.p_max_pu = p_max_pu.where(~errors, p_min_pu)
+        error_gens = errors.columns[errors.any()]
+        n.generators_t.p_max_pu[error_gens] = p_max_pu[error_gens].where(~errors[error_gens], p_min_pu[error_gens])
+        static_errors = static_errors[static_errors].index
+        n.generators.loc[static_errors, "p_max_pu"] = n.generators.loc[static_errors, "p_min_pu"]
 
 
 def add_carrier_emissions(n):
 
     emissions = (
-        pd.read_excel(
+        read_excel_cached(
             model_file, 
             sheet_name='emissions',
             index_col=[0,1])
@@ -1215,6 +1465,7 @@ if __name__ == "__main__":
     )
 
     scenario_setup = load_scenario_definition(snakemake)
+    re_profiles = RenewableProfileStore(snakemake.input.renewable_profiles)
 
     logging.info("Loading carriers from scenario file")
     carriers = get_carriers_from_model_file(scenario_setup)
@@ -1230,6 +1481,7 @@ if __name__ == "__main__":
 
     logging.info("Attaching extendable generators")
     attach_extendable_generators(n, carriers)
+    re_profiles.close()
 
     logging.info("Attaching fixed storage")
     attach_fixed_storage(n, carriers)
@@ -1238,7 +1490,10 @@ if __name__ == "__main__":
     attach_extendable_storage(n, carriers)
 
     logging.info("Adjusting for changes in fuel price over time")
-    adjust_for_variable_fuel_costs(n)
+    adjust_for_variable_fuel_costs(
+        n, 
+        per_period = snakemake.config["electricity"]["marginal_cost_per_period"] and snakemake.wildcards.model_type != "dispatch"
+    )
 
     adj_by_pu = snakemake.config["electricity"]["adjust_by_p_max_pu"]
     logging.info(f"Adjusting by p_max_pu for {list(adj_by_pu.keys())}")
@@ -1263,11 +1518,12 @@ if __name__ == "__main__":
     logging.info("Exporting network.")
     if n.multi_invest:
         initial_ramp_rate_fix(n)
+    set_time_series_precision(n, snakemake.config["precision"])
 
     if snakemake.wildcards.model_type == "dispatch":
-        for y in n.investment_periods:
-            sns = n.snapshots[n.snapshots.get_level_values("period")==y]
-            n_y = single_year_network_copy(n, snapshots=sns, investment_periods=sns.unique("period"))
-            n_y.export_to_netcdf(f"{scenario_path}/dispatch_{y}.nc") 
+        export_period_networks(n, f"{scenario_path}/dispatch_{{period}}.nc", snakemake.config["netcdf_export"], snakemake.config["precision"])
     else:
-        n.export_to_netcdf(snakemake.output[0])
+        export_network(n, snakemake.output[0], snakemake.config["netcdf_export"], snakemake.config["precision"])
+
+    ext_param_store.log_stats()
+    ext_param_store.save(snakemake.output.extendable_parameters)
@@ -62,7 +62,7 @@ import pandas as pd
 import pypsa
 import os
 import re
-from _helpers import load_scenario_definition
+from _helpers import export_network, load_scenario_definition, set_per_period_table, set_time_series_precision
 
 def create_network():
     n = pypsa.Network()
@@ -112,21 +112,34 @@ def set_investment_periods(n, years):
         n.investment_period_weightings.at[period, "objective"] = sum(discounts)
         T += nyears
 
-def line_derating(n, lines):
-    # convert each entry of n.investment_periods to str
-    pu_max = pd.DataFrame(1, index = n.snapshots, columns=lines.index)
-    for y in n.investment_periods:
-        for l in pu_max.columns:
-            pu_max.loc[y, l] = lines.loc[l, str(y)]
+def get_line_derating(n, lines):
+    # (periods x links) derating table from the per-year columns of lines
+    derating = lines[n.investment_periods.astype(str)].T
+    return derating.set_axis(n.investment_periods)
 
-    return pu_max
+def line_derating(n, lines, dtype=np.float64):
+    if not n.multi_invest:
+        return pd.DataFrame(1, index = n.snapshots, columns=lines.index, dtype=dtype)
+    # reindex the per-period derating onto the period level of the snapshots in one step
+    pu_max = get_line_derating(n, lines).astype(dtype)
+    return pu_max.reindex(n.snapshots.get_level_values("period")).set_axis(n.snapshots)
 
 def add_components_to_network(n, buses, lines, line_config):
     n.import_components_from_dataframe(buses, "Bus")
 #   Only a transfer model is used, with allowable efficiency losses
 #   This requires two uni-directional links between nodes as PyPSA efficiency is not bi-directional
     if len(buses) != 1:
-        pu_max = line_derating(n, lines)
+        per_period = (
+            n.multi_invest 
+            and line_config["derating_per_period"] 
+            and snakemake.wildcards.model_type != "dispatch"
+        )
+        if per_period:
+            # stored per investment period and expanded to the snapshots before solving
+            set_per_period_table(n, "line_derating_per_period", get_line_derating(n, lines))
+            pu_max = 1
+        else:
+            pu_max = line_derating(n, lines, snakemake.config["precision"])
         n.madd(
             "Link",
             lines.index,
@@ -178,5 +191,6 @@ if __name__ == "__main__":
         set_investment_periods(n,years)
     add_components_to_network(n, buses, lines, line_config)
     
-    n.export_to_netcdf(snakemake.output[0])
+    set_time_series_precision(n, snakemake.config["precision"])
+    export_network(n, snakemake.output[0], snakemake.config["netcdf_export"], snakemake.config["precision"])
 
@@ -46,14 +46,15 @@ Outputs
 import networkx as nx
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import LineString, Point
+import shapely
+from shapely.geometry import LineString
 import logging
 import numpy as np
 from operator import attrgetter
 import os
 import pypsa
 import re
-from _helpers import save_to_geojson, load_scenario_definition
+from _helpers import calc_line_limits, save_to_geojson, load_scenario_definition, read_excel_cached
 from base_network import get_years
 from pypsa.geo import haversine
 
@@ -119,7 +120,7 @@ def load_line_data(line_config):
     udl = [u for u in udl if u not in ['existing','tdp']]
     if len(udl) > 0:
         udl_scenario = udl[0]
-        add_lines = pd.read_excel(snakemake.config["scenarios"]+'/transmission_expansion.xlsx', index_col=[0]).loc[udl_scenario].reset_index(drop=True)
+        add_lines = read_excel_cached(snakemake.config["scenarios"]+'/transmission_expansion.xlsx', index_col=[0]).loc[udl_scenario].reset_index(drop=True)
 
             
         #model_file, sheet_name="transmission_grid", index_col=[0]).loc[udl_scenario].reset_index(drop=True)
@@ -142,6 +143,7 @@ def load_line_data(line_config):
                     user_lines.loc[usr_cnt,'build_year'] = year
                     usr_cnt+=1
 
+        user_lines['bus0'], user_lines['bus1'] = np.sort(user_lines[['bus0', 'bus1']].values, axis=1).T # sort bus0 and bus1 alphabetically as in build_line_topology
         lines = pd.concat([lines, user_lines])
 
     lines['id'] = lines.index
@@ -149,45 +151,45 @@ def load_line_data(line_config):
 
     return lines
 
-def check_centroid_in_region(regions,centroids):
-    idx = regions.index[~centroids.intersects(regions['geometry'])]
-    buffered_regions = regions.buffer(-200)
-    boundary = buffered_regions.boundary
-    for i in idx:
-        # Initialize a variable to store the minimum distance
-        min_distance = np.inf
-        # Iterate over a range of distances along the boundary
-        for d in np.arange(0, boundary[i].length, 200):
-            # Interpolate a point at the current distance
-            p = boundary[i].interpolate(d)
-            # Calculate the distance between the centroid and the interpolated point
-            distance = centroids[i].distance(p)
-            # If the distance is less than the minimum distance, update the minimum distance and the closest point
-            if distance < min_distance:
-                min_distance = distance
-                closest_point = p
-        centroids[i] = closest_point
+def check_centroid_in_region(regions, centroids, method="nearest"):
+    # Centroids of non-convex regions can fall outside the region, these are moved inside:
+    # "nearest" uses the closest point on the region boundary buffered 200 m inwards and
+    # "representative_point" a point that is guaranteed to lie within the region
+    outside = regions.index[~centroids.intersects(regions['geometry'])]
+    if len(outside) == 0:
+        return centroids
+
+    inside_points = regions.loc[outside, 'geometry'].representative_point()
+    if method == "nearest":
+        boundary = regions.loc[outside, 'geometry'].buffer(-200).boundary
+        nearest = shapely.get_point(shapely.shortest_line(boundary.values, centroids[outside].values), 0)
+        # regions too narrow for the buffer fall back to the representative point
+        inside_points = inside_points.where(shapely.is_missing(nearest), nearest)
+    elif method != "representative_point":
+        raise ValueError(f"Unknown centroid relocation method {method}, use nearest or representative_point")
+
+    centroids[outside] = inside_points
     return centroids
 
+def map_points_to_regions(points, regions):
+    # single spatial join of all points against the region index, a point inside several
+    # (overlapping) regions is assigned to the first of them, as a region-by-region scan would
+    points = gpd.GeoDataFrame(geometry=points.values, crs=regions.crs)
+    region_pos = regions[["geometry"]].reset_index(drop=True)
+    joined = gpd.sjoin(points, region_pos, how="inner", predicate="within")
+    first = joined.groupby(level=0)["index_right"].min()
+    return pd.Series(regions.index[first.values], index=first.index).reindex(range(len(points)))
+
 def build_line_topology(lines, regions):
     # Extract starting and ending points of each line
     lines = lines.explode()
-    start_points = lines["geometry"].apply(lambda line: line.coords[0])
-    end_points = lines["geometry"].apply(lambda line: line.coords[-1])
-
-    # Convert start and end points to Point geometries
-    start_points = start_points.apply(Point)
-    end_points = end_points.apply(Point)
+    start_points = shapely.get_point(lines["geometry"].values, 0)
+    end_points = shapely.get_point(lines["geometry"].values, -1)
 
     # Map starting and ending points to regions
-    lines["bus0"] = start_points.apply(
-        lambda point: regions[regions.geometry.contains(point)].index.values[0] 
-        if len(regions[regions.geometry.contains(point)].index.values) > 0 else None
-    )
-    lines["bus1"] = end_points.apply(
-        lambda point: regions[regions.geometry.contains(point)].index.values[0] 
-        if len(regions[regions.geometry.contains(point)].index.values) > 0 else None
-    )
+    buses = map_points_to_regions(pd.Series(np.concatenate([start_points, end_points])), regions)
+    lines["bus0"] = buses.values[:len(lines)]
+    lines["bus1"] = buses.values[len(lines):]
     lines['id']=range(len(lines))
     lines = lines[lines['bus0']!=lines['bus1']]
     lines = lines.dropna(subset=['bus0','bus1'])
@@ -197,11 +199,19 @@ def build_line_topology(lines, regions):
     return lines
 
 
-def calc_inter_region_lines(lines, line_config):
+def add_line_limits(lines, line_config):
     lines=lines.copy()
-    line_limits = lines.apply(lambda row: calc_line_limits(row['length'], row['voltage'], line_config), axis=1)
-    lines.loc[:,'thermal_limit'], lines.loc[:,'SIL_limit'], lines.loc[:,'St_Clair_limit'] = line_limits[0].values, line_limits[1].values, line_limits[2].values
-    
+    line_limits = calc_line_limits(lines['length'], lines['voltage'], line_config)
+    lines.loc[:,'thermal_limit'], lines.loc[:,'SIL_limit'], lines.loc[:,'St_Clair_limit'] = line_limits['thermal_limit'].values, line_limits['SIL_limit'].values, line_limits['St_Clair_limit'].values
+    return lines
+
+def calc_inter_region_lines(lines, line_config):
+    # limits are only calculated if add_line_limits has not been applied already
+    if 'St_Clair_limit' not in lines.columns:
+        lines = add_line_limits(lines, line_config)
+    else:
+        lines = lines.copy()
+
     def apply_n1_approximation(group):
         # If there is only one row in the group, return it as is
         if len(group) == 1:
@@ -234,6 +244,35 @@ def calc_inter_region_lines(lines, line_config):
 
     return inter_region_lines
 
+def calc_n1_limits_per_year(lines, years, line_config):
+    """
+    St Clair n-1 limits between regions for each year in years, adding lines in order of
+    build_year instead of recalculating calc_inter_region_lines on the lines built by each
+    year. The n-1 rule is applied incrementally: one line between two regions is derated by
+    n1_approx_single_lines, with more lines the largest one is removed.
+
+    Returns a (bus0, bus1) x years DataFrame, NaN where no lines are built yet.
+    """
+    lines = lines[['bus0','bus1','build_year','St_Clair_limit']].copy()
+    lines['build_year'] = lines['build_year'].astype(float)
+    lines = lines.sort_values('build_year', kind='stable')
+
+    # limits are positive so lines with unknown limits add nothing to the sum or maximum
+    St_Clair = lines['St_Clair_limit'].fillna(0).groupby([lines['bus0'], lines['bus1']])
+    count = St_Clair.cumcount() + 1
+    total = St_Clair.cumsum()
+    lines['n1'] = (total - St_Clair.cummax()).where(count > 1, total * line_config["n1_approx_single_lines"])
+
+    n1 = (
+        lines.groupby(['bus0','bus1','build_year'])['n1'].last()
+        .unstack('build_year')
+        .ffill(axis=1)
+    )
+    n1 = n1.T.reindex(pd.Index(years, dtype=float), method='ffill').T
+    n1.columns = years
+
+    return n1
+
 def extend_topology(lines, regions, centroids):
     # get a list of lines between all adjacent regions
     adj_lines = gpd.sjoin(regions, regions, op='touches')['index_right'].reset_index()
@@ -251,23 +290,9 @@ def extend_topology(lines, regions, centroids):
 
     return lines
 
-def calc_line_limits(length, voltage, line_config):
-    # digitised from https://www.researchgate.net/figure/The-St-Clair-curve-as-based-on-the-results-of-14-retrieved-from-15-is-used-to_fig3_318692193
-    if voltage in [220, 275, 400, 765]:
-        thermal = line_config['thermal'][voltage]
-        SIL = line_config['SIL'][voltage]
-        St_Clair = min(thermal, SIL * 53.736 * (length) ** -0.65) # length in km
-
-    else:
-        thermal = np.nan
-        SIL = np.nan
-        St_Clair = np.nan
-
-    return pd.Series([thermal, SIL, St_Clair])
-
 def build_regions(regions, line_config):
     centroids = regions['geometry'].centroid
-    centroids = check_centroid_in_region(regions,centroids)
+    centroids = check_centroid_in_region(regions, centroids, line_config["centroid_relocation"])
     centroids = centroids.to_crs(snakemake.config["gis"]["crs"]["geo_crs"])
 
     v_nom = line_config['v_nom']
@@ -313,6 +338,9 @@ def build_topology(centroids, years, line_config):
     # Reading and processing the existing lines
     lines = load_line_data(line_config)
 
+    # Line limits are calculated once and reused for the end year and every simulation year
+    lines = add_line_limits(lines, line_config)
+
     # Build the nextwork topology for the
     end_year_topology = calc_inter_region_lines(lines, line_config)
     end_year_topology['geometry'] = end_year_topology.apply(
@@ -320,22 +348,11 @@ def build_topology(centroids, years, line_config):
         axis=1
     )
 
-    topology_derating = pd.DataFrame(columns=['bus0','bus1']+years)
-    topology_derating[['bus0','bus1']] = end_year_topology[['bus0','bus1']]
-
-    for year in years:
-        # Filter lines for the current year
-        year_lines = lines[lines['build_year'] <= year]
-
-        # Create inter-region lines
-        inter_region_lines = calc_inter_region_lines(year_lines, line_config)
-        year_topology = end_year_topology.copy()
-        year_topology.loc[:,year_topology.columns[2] :'St_Clair_limit_n1'] = 0
-
-        for idx, row in inter_region_lines.iterrows():
-            year_topology.loc[(year_topology['bus0'] == row['bus0']) & (year_topology['bus1'] == row['bus1']), 'St_Clair_limit_n1'] = row['St_Clair_limit_n1']
+    # St_Clair_limit_n1 of the lines built by each year, joined onto the end year topology
+    end_year_n1 = end_year_topology.set_index(['bus0','bus1'])['St_Clair_limit_n1']
+    year_n1 = calc_n1_limits_per_year(lines, years, line_config).reindex(end_year_n1.index).fillna(0)
 
-        topology_derating.loc[:,year] = year_topology['St_Clair_limit_n1'].div(end_year_topology['St_Clair_limit_n1'])
+    topology_derating = year_n1.div(end_year_n1, axis=0).reset_index(drop=True)
 
     network_topology = pd.concat([end_year_topology, topology_derating.loc[:,years]], axis=1)
     network_topology = gpd.GeoDataFrame(network_topology, geometry='geometry', crs = snakemake.config["gis"]["crs"]["geo_crs"])
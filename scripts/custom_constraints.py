@@ -5,7 +5,7 @@ from pypsa.descriptors import get_switchable_as_dense as get_as_dense, expand_se
 from pypsa.optimization.common import reindex
 import os
 
-from _helpers import get_investment_periods
+from _helpers import get_investment_periods, read_excel_cached
 # from add_electricity import load_costs, update_transmission_costs
 
 import xarray as xr
@@ -165,7 +165,7 @@ def apply_operational_constraints(n, sns, **kwargs):
 
 def set_operational_limits(n, sns, scenario_setup):
 
-    op_limits = pd.read_excel(
+    op_limits = read_excel_cached(
         os.path.join(scenario_setup["sub_path"], "operational_constraints.xlsx"),
         sheet_name='operational_constraints',
         index_col=list(range(9)),
@@ -221,12 +221,12 @@ def reserve_margin_constraints(n, sns, scenario_setup, snakemake):
     # The sum of res_margin_carriers multiplied by their assumed constribution factors 
     # must be higher than the maximum peak demand in each year by the reserve_margin value
 
-    res_margin = pd.read_excel(
+    res_margin = read_excel_cached(
         os.path.join(scenario_setup["sub_path"], "reserve_margin.xlsx"), 
         sheet_name="reserve_margin",
         index_col=[0,1]).loc[scenario_setup["reserve_margin"]].drop("unit", axis=1)
 
-    capacity_credit = pd.read_excel(
+    capacity_credit = read_excel_cached(
             os.path.join(scenario_setup["sub_path"], "reserve_margin.xlsx"), 
             sheet_name="capacity_credits",
             index_col=[0])[scenario_setup["capacity_credits"]]
@@ -287,7 +287,7 @@ def annual_co2_constraints(n, sns, param, scenario_setup):
             )
     lhs = (gen_p * co2_emissions).sum("Generator").groupby("period").sum()
 
-    annual_limits = pd.read_excel(
+    annual_limits = read_excel_cached(
         os.path.join(scenario_setup["sub_path"], "carbon_constraints.xlsx"), 
         sheet_name="annual_carbon_constraint",
         index_col=[0]).loc[scenario_setup["co2_constraints"]]
@@ -62,8 +62,8 @@ from pypsa.linopt import get_var, write_objective, define_constraints, linexpr
 from pypsa.descriptors import get_switchable_as_dense as get_as_dense, expand_series
 from pypsa.optimization.common import reindex
 
-from _helpers import configure_logging, remove_leap_day, normalize_and_rename_df, assign_segmented_df_to_network, load_scenario_definition
-from add_electricity import load_extendable_parameters#, update_transmission_costs
+from _helpers import configure_logging, export_network, remove_leap_day, pop_per_period_table, expand_per_period, set_time_series_precision, normalize_and_rename_df, assign_segmented_df_to_network, load_scenario_definition, read_excel_cached
+from add_electricity import load_extendable_parameters, ext_param_store#, update_transmission_costs
 from concurrent.futures import ProcessPoolExecutor
 import xarray as xr
 import warnings
@@ -89,7 +89,7 @@ def set_extendable_limits_global(n):
     # Iterate over possible limits and try to read them from the Excel file
     for lim in ["max", "min"]:
         try:
-            global_limit = pd.read_excel(
+            global_limit = read_excel_cached(
                 os.path.join(scenario_setup["sub_path"], "extendable_technologies.xlsx"),
                 sheet_name=f'{lim}_total_installed',
                 index_col=[0, 1, 3, 2, 4],
@@ -126,7 +126,7 @@ def set_extendable_limits_per_bus(n):
     ignore = {"max": "unc", "min": 0}
 
     bus_limits = {
-        lim: pd.read_excel(
+        lim: read_excel_cached(
             os.path.join(scenario_setup["sub_path"], "extendable_technologies.xlsx"),
             sheet_name=f'{lim}_total_installed',
             index_col=[0, 1, 3, 2, 4],
@@ -333,7 +333,7 @@ def apply_time_segmentation(n, segments, config):
 
 def calc_emissions(n, scenario_setup):
 
-    carrier_emissions = pd.read_excel(
+    carrier_emissions = read_excel_cached(
         os.path.join(scenario_setup["sub_path"], "extendable_technologies.xlsx"), 
         sheet_name = "parameters",
         index_col = [0,2,1],
@@ -388,6 +388,9 @@ if __name__ == "__main__":
 
     n = pypsa.Network(snakemake.input[0])
     scenario_setup = load_scenario_definition(snakemake)
+    ext_param_store.load(snakemake.input.extendable_parameters)
+    marginal_cost_per_period = pop_per_period_table(n, "marginal_cost_per_period")
+    line_derating_per_period = pop_per_period_table(n, "line_derating_per_period")
     
     opts = scenario_setup["options"].split("-")
     for o in opts:
@@ -413,10 +416,15 @@ if __name__ == "__main__":
         set_extendable_limits_global(n) 
     set_extendable_limits_per_bus(n)
 
+    expand_per_period(n, "Generator", "marginal_cost", marginal_cost_per_period)
+    expand_per_period(n, "Link", "p_max_pu", line_derating_per_period)
+    set_time_series_precision(n, np.float64)
+
     logging.info("Solving network")
     solve_network(n, n.snapshots)
+    ext_param_store.log_stats()
     
-    n.export_to_netcdf(snakemake.output[0])
+    export_network(n, snakemake.output[0], snakemake.config["netcdf_export"], snakemake.config["precision"])
     n.statistics().to_csv(snakemake.output[1])
     calc_emissions(n, scenario_setup).to_csv(snakemake.output[2])
     #calc_cumulative_new_capacity(n).to_csv(snakemake.output[3])
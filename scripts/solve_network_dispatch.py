@@ -27,12 +27,15 @@ from _helpers import (
     read_and_filter_generators,
     remove_leap_day,
     drop_non_pypsa_attrs,
+    export_network,
     normed,
     get_start_year,
     get_snapshots,
     get_investment_periods,
     adjust_by_p_max_pu,
-    apply_default_attr
+    apply_default_attr,
+    read_excel_cached,
+    set_time_series_precision,
 )
 
 from prepare_and_solve_network import (
@@ -43,7 +46,7 @@ from prepare_and_solve_network import (
 
 def get_min_stable_level(n, model_file, model_setup, existing_carriers, extended_carriers):
     
-    existing_param = pd.read_excel(
+    existing_param = read_excel_cached(
         model_file, 
         sheet_name="fixed_conventional",
         na_values=["-"],
@@ -53,7 +56,7 @@ def get_min_stable_level(n, model_file, model_setup, existing_carriers, extended
     existing_gens = n.generators.query("carrier in @existing_carriers & p_nom_extendable == False").index
     existing_msl= existing_param.loc[existing_gens, "Min Stable Level (%)"].rename("p_min_pu")
     
-    extended_param = pd.read_excel(
+    extended_param = read_excel_cached(
         model_file, 
         sheet_name = "extendable_parameters",
         index_col = [0,2,1],
@@ -210,10 +213,12 @@ if __name__ == "__main__":
             }
         )
     n = pypsa.Network(snakemake.input.network)
+    # dispatch networks may be stored in float32, the model is always built in float64
+    set_time_series_precision(n, np.float64)
 
-    model_file = pd.ExcelFile(snakemake.input.model_file)
+    model_file = snakemake.input.model_file
     model_setup = (
-        pd.read_excel(
+        read_excel_cached(
             model_file, 
             sheet_name="model_setup",
             index_col=[0])
@@ -231,4 +236,4 @@ if __name__ == "__main__":
     solver_options = snakemake.config["solving"]["solver"].copy()
     n.optimize.solve_model(solver_name=solver_name, solver_options=solver_options)
 
-    n.export_to_netcdf(snakemake.output[0])
\ No newline at end of file
+    export_network(n, snakemake.output[0], snakemake.config["netcdf_export"], snakemake.config["precision"])
\ No newline at end of file
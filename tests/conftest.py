@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# the workflow scripts import each other as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+
+@pytest.fixture(autouse=True)
+def workbook_cache(tmp_path, monkeypatch):
+    # keep read_excel_cached from writing to resources/workbook_cache inside the repo
+    import _helpers
+
+    monkeypatch.setattr(_helpers, "WORKBOOK_CACHE_DIR", tmp_path.joinpath("workbook_cache"))
+    monkeypatch.setattr(_helpers, "_workbook_frames", {})
@@ -0,0 +1,77 @@
+"""
+Regression tests for build_extendable_parameters in add_electricity.py against the shipped
+ME IRP 2024 workbooks.
+
+data/extendable_parameters.pkl.gz holds the parameter matrix of every parameter_mapping
+scenario as built by the row-by-row implementation that preceded the single reindex.
+"""
+
+import os
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+
+import add_electricity
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUB_PATH = os.path.join(ROOT, "scenarios", "ME IRP 2024", "sub_scenarios")
+WORKBOOK = os.path.join(SUB_PATH, "extendable_technologies.xlsx")
+EXPECTED = os.path.join(ROOT, "tests", "data", "extendable_parameters.pkl.gz")
+
+YEARS = [2024, 2030, 2040, 2050]
+# parameters that are taken from the workbook as is, apart from unit conversion
+INTERPOLATED = ["investment", "lifetime", "discount_rate", "efficiency", "fuel", "VOM"]
+
+with open(os.path.join(ROOT, "config.yaml")) as f:
+    CONFIG = yaml.safe_load(f)
+
+SCENARIOS = pd.read_excel(
+    WORKBOOK, sheet_name="parameter_mapping", index_col=[0, 1]
+).index.get_level_values(0).unique()
+
+
+def build(scenario, years):
+    n = types.SimpleNamespace(
+        snapshots=pd.MultiIndex.from_arrays([years, pd.to_datetime([f"{y}-01-01" for y in years])]),
+        multi_invest=1,
+    )
+    scenario_setup = pd.Series({"sub_path": SUB_PATH, "extendable_parameters": scenario})
+    return add_electricity.build_extendable_parameters(n, scenario_setup, types.SimpleNamespace(config=CONFIG))
+
+
+@pytest.fixture(scope="module")
+def expected():
+    return pd.read_pickle(EXPECTED)
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_matches_previous_implementation(scenario, expected):
+    pd.testing.assert_frame_equal(build(scenario, YEARS), expected.loc[scenario])
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_missing_years_are_interpolated(scenario, expected, monkeypatch):
+    # drop 2030 from the parameters sheet so that it has to be interpolated from 2029 and 2031
+    read_excel_cached = add_electricity.read_excel_cached
+
+    def read_without_2030(file, sheet_name=0, **kwargs):
+        df = read_excel_cached(file, sheet_name=sheet_name, **kwargs)
+        return df.drop(columns=2030) if sheet_name == "parameters" else df
+
+    monkeypatch.setattr(add_electricity, "read_excel_cached", read_without_2030)
+    param = build(scenario, YEARS).loc[INTERPOLATED]
+
+    expected = expected.loc[scenario].loc[INTERPOLATED]
+    years = expected.columns.drop("unit")
+    np.testing.assert_allclose(
+        param[2030].astype(float),
+        (expected[2029].astype(float) + expected[2031].astype(float)) / 2,
+    )
+    # all other years and the units are unaffected
+    pd.testing.assert_frame_equal(
+        param[years.drop(2030)].astype(float), expected[years.drop(2030)].astype(float)
+    )
+    pd.testing.assert_series_equal(param["unit"], expected["unit"])